@@ -0,0 +1,85 @@
+"""Micro-benchmark of topic name extraction.
+
+Usage:
+    python benchmarks/topic_extraction.py [captions.jsonl] [-n ROUNDS]
+
+The corpus is a file with one JSON encoded caption per line, e.g. exported
+from a source channel. Without one a small built-in sample is used.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.common.utils.topic_names import (  # noqa: E402
+    get_topic_pattern,
+    parse_topic_name,
+)
+
+SAMPLE_CAPTIONS = [
+    "Lecture 12 - Thermodynamics\nTopic: Physics\nBy: Team",
+    "📘 Chapter 4 notes\n\nTopic:   Organic   Chemistry  \n#notes",
+    "topic: maths\nIntegration by parts, part 2",
+    "Revision sheet, no topic line here",
+    "Class recording\nTOPIC: Modern   History\nDuration 1h 12m",
+    "DPP 07 solutions\nTopic: Biology - Genetics",
+    "",
+]
+
+
+def legacy_extract(text):
+    """The extraction before it was precompiled, kept for comparison"""
+    topic_match = re.search(
+        r"Topic:\s*(.+?)(?:\n|$)", text, re.IGNORECASE | re.MULTILINE
+    )
+    if not topic_match:
+        return
+    extracted_topic = topic_match.group(1).strip()
+    extracted_topic = re.sub(r"\s+", " ", extracted_topic)
+    # the live path normalized the whitespace a second time
+    return re.sub(r"\s+", " ", extracted_topic)
+
+
+def load_corpus(path):
+    if not path:
+        return SAMPLE_CAPTIONS
+    with open(path, encoding="utf-8") as corpus:
+        return [json.loads(line) for line in corpus if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="captions, one JSON string per line")
+    parser.add_argument("-n", "--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    captions = load_corpus(args.corpus)
+    aliases = {"physics": "Physics Notes"}
+    custom = get_topic_pattern(r"Topic:\s*(.+?)(?:\n|$)")
+
+    for caption in captions:
+        legacy = legacy_extract(caption)
+        current = parse_topic_name(caption)
+        if legacy != current:
+            print(f"Mismatch on {caption!r}: {legacy!r} != {current!r}")
+
+    cases = {
+        "legacy": lambda: [legacy_extract(caption) for caption in captions],
+        "precompiled": lambda: [parse_topic_name(caption) for caption in captions],
+        "custom + aliases": lambda: [
+            parse_topic_name(caption, custom, aliases) for caption in captions
+        ],
+    }
+    print(f"{len(captions)} captions x {args.rounds} rounds")
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=args.rounds, repeat=5))
+        per_caption = seconds / (args.rounds * len(captions)) * 1e6
+        print(f"{name:>18}: {per_caption:.2f} us/caption")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ if os.name != "nt":
 
 import asyncio
 import logging
+import random
+import time
 from pyrogram import Client, raw, types, errors
 import logging.config
 from bot.config import Config
@@ -17,9 +19,22 @@ from plugins.admin.utils import add_admin
 from bot.logger import setup_root_logger
 from bot.database import init_db
 from database import Session
-from plugins.account.utils import delete_and_notify_session
+from plugins.account.utils import (
+    delete_and_notify_session,
+    get_session_by_user_id,
+    load_sessions,
+)
 import pyromod
 from plugins.batch.utils.auto_resume import auto_resume_batch
+from plugins.batch.utils.control import watch_batch_changes
+from plugins.common.utils.clients import (
+    connect_client,
+    get_forward_owner_ids,
+    run_client_pool,
+)
+from plugins.common.utils.ratelimit import get_client_limiter
+from plugins.forwards.utils.routing import load_forward_routes
+from plugins.forwards.utils.queue import replay_forward_queue
 
 setup_root_logger()
 
@@ -37,6 +52,8 @@ class Bot(Client):
     async def start(self, *args, **kwargs):
         await super().start(*args, **kwargs)
         await init_db()
+        await load_forward_routes()
+        await load_sessions()
         me = await self.get_me()
         self.owner = await self.get_users(int(Config.OWNER_ID))
         self.username = f"@{me.username}"
@@ -45,7 +62,17 @@ class Bot(Client):
         logging.info(f"Owner: {self.owner.mention}")
         await add_admin(self.owner.id)
         await set_commands(self)
+        if Config.BATCH_CHANGE_STREAM:
+            self.batch_watcher = asyncio.create_task(watch_batch_changes())
+        # the bot answers commands while the user clients come up
+        self.clients_ready = asyncio.create_task(self.start_background_work())
+
+    async def start_background_work(self):
+        """Start the user clients, then resume the work that needs them"""
+        # replayed before any client can receive and queue the same post again
+        await replay_forward_queue()
         await start_user_clients()
+        self.client_pool = asyncio.create_task(run_client_pool())
         await auto_resume_batch(self)
 
     async def stop(self, *args):
@@ -134,6 +161,7 @@ class Bot(Client):
             return await func(*args, **kwargs)
         except errors.FloodWait as e:
             logging.warning(f"Floodwait for {e.value} seconds at {func.__name__}")
+            get_client_limiter(self).on_flood_wait(e.value)
             await asyncio.sleep(e.value)
             return await self.floodwait_handler(func, *args, **kwargs)
 
@@ -155,10 +183,15 @@ class User(Client):
     async def start(self, *args, **kwargs):
         try:
             await super().start(*args, **kwargs)
-        except Exception as e:
+        except errors.Unauthorized as e:
+            # the session was revoked or expired, the user has to log in again
             logging.error(e)
             await delete_and_notify_session(self, self.session_string)
             return
+        except Exception as e:
+            # clients are connected on demand, the next use tries again
+            logging.error(f"Error starting user client {self.name}: {e}")
+            return
 
         me = await self.get_me()
         self.username = f"@{me.username}"
@@ -175,6 +208,7 @@ class User(Client):
             return await func(*args, **kwargs)
         except errors.FloodWait as e:
             logging.warning(f"Floodwait for {e.value} seconds at {func.__name__}")
+            get_client_limiter(self).on_flood_wait(e.value)
             await asyncio.sleep(e.value)
             return await self.floodwait_handler(func, *args, **kwargs)
 
@@ -194,10 +228,40 @@ async def set_commands(app: "Bot"):
 
 
 async def start_user_clients():
-    clients_to_start = []
-    sessions = Session.find()
-    async for session in sessions:
-        c = User(session.session_string, name=f"user_{session.id}")
-        clients_to_start.append(c)
+    """Start the user clients a few at a time, staggered so logins don't spike.
+
+    With the idle pool enabled only the owners of active forwards are started,
+    every other client is connected on demand.
+    """
+    user_ids = list(Config.SESSIONS)
+    if Config.CLIENT_IDLE_TIMEOUT > 0:
+        user_ids = [
+            user_id
+            for user_id in get_forward_owner_ids()
+            if user_id in Config.SESSIONS
+        ]
+    # the active session of each user, their other accounts connect on demand
+    sessions = [get_session_by_user_id(user_id) for user_id in user_ids]
+
+    semaphore = asyncio.Semaphore(max(Config.CLIENT_STARTUP_CONCURRENCY, 1))
+    boot_time = time.monotonic()
 
-    await asyncio.gather(*[c.start() for c in clients_to_start])
+    async def start_client(session: Session):
+        async with semaphore:
+            await asyncio.sleep(random.uniform(0, Config.CLIENT_STARTUP_JITTER))
+            try:
+                c = await connect_client(session)
+            except Exception as e:
+                # one bad session must not keep the others, or the resumes, from starting
+                logging.exception(f"Error starting client {session.id}: {e}")
+                return
+            if c:
+                logging.info(
+                    f"User {c.username} ready {time.monotonic() - boot_time:.1f}s after boot"
+                )
+
+    await asyncio.gather(*[start_client(session) for session in sessions])
+    logging.info(
+        f"Started {len(Config.CLIENTS)} of {len(sessions)} user clients "
+        f"in {time.monotonic() - boot_time:.1f}s"
+    )
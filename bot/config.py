@@ -1,4 +1,5 @@
 import os
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 if os.path.exists("config.env"):
@@ -26,13 +27,71 @@ class Config(object):
     LOG_CHANNEL = int(os.environ.get("LOG_CHANNEL", OWNER_ID))
 
     CLIENTS = {}
+    # User clients started at once at boot, each after a random 0..N second delay
+    CLIENT_STARTUP_CONCURRENCY = int(os.environ.get("CLIENT_STARTUP_CONCURRENCY", 5))
+    CLIENT_STARTUP_JITTER = float(os.environ.get("CLIENT_STARTUP_JITTER", 1))
+    # Seconds before an unused client is disconnected, 0 keeps every client connected
+    CLIENT_IDLE_TIMEOUT = int(os.environ.get("CLIENT_IDLE_TIMEOUT", 900))
+    # session id -> owner user id / last use, user id -> running batches pinning it
+    CLIENT_OWNERS = {}
+    CLIENT_LAST_USED = {}
+    CLIENT_PINS = {}
+    CLIENT_LOCKS = {}
+    # user id -> {session id: Session}, see plugins/account/utils/sessions.py
+    SESSIONS = {}
+
+    # Adaptive rate limits (calls per second) per client and per target chat
+    CLIENT_RATE_LIMIT = float(os.environ.get("CLIENT_RATE_LIMIT", 20))
+    CHAT_RATE_LIMIT = float(os.environ.get("CHAT_RATE_LIMIT", 3))
+    # least recently used limiters are dropped past the size, e.g. broadcast recipients
+    RATE_LIMITERS = OrderedDict()
+    RATE_LIMITERS_SIZE = int(os.environ.get("RATE_LIMITERS_SIZE", 1000))
+
+    # Batch file entries are bulk written every N records or N seconds
+    LEDGER_FLUSH_SIZE = int(os.environ.get("LEDGER_FLUSH_SIZE", 100))
+    LEDGER_FLUSH_INTERVAL = float(os.environ.get("LEDGER_FLUSH_INTERVAL", 5))
+
+    # Most accounts a multi-account batch is split across
+    BATCH_MAX_SHARDS = int(os.environ.get("BATCH_MAX_SHARDS", 4))
+    # Batches allowed to run at once in the process and on one account
+    BATCH_MAX_RUNNING = int(os.environ.get("BATCH_MAX_RUNNING", 4))
+    BATCH_MAX_PER_CLIENT = int(os.environ.get("BATCH_MAX_PER_CLIENT", 1))
+    # batch id -> BatchControl of the running batches, see plugins/batch/utils/control.py
+    BATCH_CONTROLS = {}
+    # Relay pauses and deletes from other processes, needs a replica set
+    BATCH_CHANGE_STREAM = is_enabled(os.environ.get("BATCH_CHANGE_STREAM", "false"), False)
+    # Seconds a batch lease lasts without a heartbeat, see plugins/batch/utils/lease.py
+    BATCH_LEASE_TTL = int(os.environ.get("BATCH_LEASE_TTL", 60))
+    # Least seconds between two edits of a batch progress message
+    BATCH_PROGRESS_INTERVAL = float(os.environ.get("BATCH_PROGRESS_INTERVAL", 10))
+    # Batch pipeline: id windows read ahead, copy workers per shard, stage queue size
+    BATCH_READ_AHEAD = int(os.environ.get("BATCH_READ_AHEAD", 2))
+    BATCH_COPY_WORKERS = int(os.environ.get("BATCH_COPY_WORKERS", 2))
+    BATCH_STAGE_QUEUE_SIZE = int(os.environ.get("BATCH_STAGE_QUEUE_SIZE", 8))
 
     # Update Channel
     UPDATE_CHANNEL = os.environ.get("UPDATE_CHANNEL") # link
 
     # Button ID Constant
     BUTTON_ID_CACHE = {}
-    FORWARD_CREATE_QUEUE = []
+    # live forward worker pool, see plugins/forwards/utils/queue.py
+    FORWARD_WORKERS = int(os.environ.get("FORWARD_WORKERS", 4))
+    FORWARD_QUEUES = []
+    # Seconds before queued posts whose fetch failed are tried again
+    FORWARD_RETRY_DELAY = float(os.environ.get("FORWARD_RETRY_DELAY", 30))
+    # and dropped after this many failed fetches
+    FORWARD_MAX_ATTEMPTS = int(os.environ.get("FORWARD_MAX_ATTEMPTS", 10))
+    # (chat id, message id) -> time first seen, shared by every user client
+    SEEN_POSTS = OrderedDict()
+    SEEN_POSTS_TTL = int(os.environ.get("SEEN_POSTS_TTL", 300))
+    SEEN_POSTS_SIZE = int(os.environ.get("SEEN_POSTS_SIZE", 10000))
+    # Seconds to let every part of a live album arrive before it is copied
+    ALBUM_SETTLE_DELAY = float(os.environ.get("ALBUM_SETTLE_DELAY", 2))
+    # source channel id -> active forwards, see plugins/forwards/utils/routing.py
+    FORWARD_ROUTES = {}
+    # target group id -> TopicCache, see plugins/common/utils/topics.py
+    TOPIC_CACHES = {}
+    TOPIC_CACHE_TTL = int(os.environ.get("TOPIC_CACHE_TTL", 3600))
 
 class Script(object):
     START_MESSAGE = (
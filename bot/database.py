@@ -1,10 +1,46 @@
-from database import User, Admin, Session, Forward, Batch, File
+import logging
+from database import User, Admin, Session, Forward, Batch, File, ForwardQueueItem
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from bot.config import Config
 
+logger = logging.getLogger(__name__)
+
+DOCUMENT_MODELS = [Admin, User, Session, Forward, Batch, File, ForwardQueueItem]
+
 
 async def init_db():
     client = AsyncIOMotorClient(Config.DATABASE_URL)
     db = client[Config.DATABASE_NAME]
-    await init_beanie(database=db, document_models=[Admin, User, Session, Forward, Batch, File])
+    # init_beanie creates every index declared in the models' Settings
+    await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+    await check_indexes()
+
+
+async def check_indexes():
+    """Report declared indexes that are missing and existing indexes never used"""
+    for model in DOCUMENT_MODELS:
+        collection = model.get_motor_collection()
+        declared = {
+            index.document["name"]: dict(index.document["key"])
+            for index in getattr(model.Settings, "indexes", [])
+        }
+
+        try:
+            existing = await collection.index_information()
+            stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        except Exception as e:
+            logger.warning(f"Could not check indexes of {collection.name}: {e}")
+            continue
+
+        existing_keys = [dict(info["key"]) for info in existing.values()]
+        for name, key in declared.items():
+            if key not in existing_keys:
+                logger.warning(f"Missing index {name} {key} on {collection.name}")
+
+        for stat in stats:
+            if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0:
+                logger.info(
+                    f"Unused index {stat['name']} on {collection.name} "
+                    f"since {stat['accesses']['since']}"
+                )
@@ -2,4 +2,5 @@ from .admin import Admin
 from .user import User, Session
 from .forwards import Forward
 from .batch import Batch
-from .files import File
\ No newline at end of file
+from .files import File, FileSourceMessage
+from .queue import ForwardQueueItem
\ No newline at end of file
@@ -1,8 +1,10 @@
+from typing import Optional
 from beanie import Document, Link
 from pydantic import Field
 from datetime import datetime
 from database.user import User
 from database.forwards import Forward
+from pymongo import ASCENDING, IndexModel
 
 
 class Batch(Document):
@@ -11,9 +13,24 @@ class Batch(Document):
     active: bool = Field(default=True)
     completed: bool = Field(default=False)
     progress_message_id: int = Field(default=0)  # progress message id in user chat
-    last_message_id: int = Field(default=0)  # last message id of the source channel
+    # legacy range end and checkpoint, becomes end_message_id on the first run
+    last_message_id: int = Field(default=0)
     start_message_id: int = Field(default=0)  # start message id of the source channel
+    # last message id of the range, 0 until pinned to the latest message, None on
+    # batches created before the range end and the cursor were split
+    end_message_id: Optional[int] = Field(default=None)
+    cursor_message_id: int = Field(default=0)  # every message up to it is done
+    sharded: bool = Field(default=False)  # split the range across several accounts
+    lease_owner: Optional[str] = Field(default=None)  # run token of the runner
+    lease_expires_at: Optional[datetime] = Field(default=None)  # UTC, server clock
     created_at: datetime = Field(default_factory=datetime.now)
 
     class Settings:
         name = "batch"
+        indexes = [
+            IndexModel(
+                [("user.$id", ASCENDING), ("completed", ASCENDING)],
+                name="user_completed",
+            ),
+            IndexModel([("completed", ASCENDING)], name="completed"),
+        ]
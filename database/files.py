@@ -1,4 +1,6 @@
 from beanie import Document, Link
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
 from database.user import User
 from database.forwards import Forward
 
@@ -12,4 +14,21 @@ class File(Document):
     user: Link[User]
 
     class Settings:
-        name = "files"
\ No newline at end of file
+        name = "files"
+        indexes = [
+            IndexModel(
+                [
+                    ("source_channel_id", ASCENDING),
+                    ("target_group_id", ASCENDING),
+                    ("user.$id", ASCENDING),
+                    ("source_message_id", ASCENDING),
+                ],
+                name="source_target_user_message",
+            ),
+        ]
+
+
+class FileSourceMessage(BaseModel):
+    """Projection holding only the source message id of a file"""
+
+    source_message_id: int
@@ -1,8 +1,10 @@
-from beanie import Document, Link
+import re
+from beanie import Document, Insert, Link, Replace, before_event
 from pydantic import Field
 from datetime import datetime
 from database.user import User
-from typing import Optional
+from typing import Dict, Optional
+from pymongo import ASCENDING, IndexModel
 
 
 class Forward(Document):
@@ -13,7 +15,32 @@ class Forward(Document):
     source_channel_title: Optional[str] = None  # Source channel title (optional for legacy data)
     target_group_title: Optional[str] = None  # Target group title (optional for legacy data)
     active: bool = Field(default=True)
+    # custom regex for the topic name, its first group is the name
+    topic_pattern: Optional[str] = None
+    # lowercase topic name -> topic the posts go to instead
+    topic_aliases: Dict[str, str] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.now)
 
+    # not on save, so a forward whose bad pattern came from a direct database
+    # edit can still be soft deleted, run time falls back to the default pattern
+    @before_event(Insert, Replace)
+    def check_topic_pattern(self):
+        """Refuse to create a forward with a topic pattern that doesn't compile"""
+        if self.topic_pattern:
+            try:
+                re.compile(self.topic_pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid topic pattern {self.topic_pattern!r}: {e}")
+
     class Settings:
-        name = "forwards"
\ No newline at end of file
+        name = "forwards"
+        indexes = [
+            IndexModel(
+                [("source_channel_id", ASCENDING), ("active", ASCENDING)],
+                name="source_channel_active",
+            ),
+            IndexModel(
+                [("user.$id", ASCENDING), ("active", ASCENDING)],
+                name="user_active",
+            ),
+        ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel
+
+
+class ForwardQueueItem(Document):
+    chat_id: int  # source channel id
+    message_id: int  # post id in the source channel
+    client_id: int  # id of the user client that received the post
+    media_group_id: Optional[str] = None  # set when the post is part of an album
+    attempts: int = 0  # failed fetches so far
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "forward_queue"
+        indexes = [
+            IndexModel([("created_at", ASCENDING)], name="created_at"),
+        ]
@@ -1,6 +1,7 @@
 from beanie import Document, Link
 from pydantic import Field
 from datetime import datetime
+from pymongo import ASCENDING, IndexModel
 
 
 class User(Document):
@@ -21,3 +22,7 @@ class Session(Document):
 
     class Settings:
         name = "sessions"
+        indexes = [
+            IndexModel([("user.$id", ASCENDING)], name="user"),
+            IndexModel([("session_string", ASCENDING)], name="session_string"),
+        ]
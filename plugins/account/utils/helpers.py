@@ -1,14 +1,22 @@
 from contextlib import suppress
 import traceback
-from bot.config import Config
 from database import Session
 from pyrogram import Client
+from plugins.common.utils.clients import connect_client, forget_client, stop_client
+from .sessions import (
+    add_session,
+    get_session_by_user_id,
+    get_sessions_by_user_id,
+    load_sessions,
+    remove_session,
+)
 
 async def delete_and_notify_session(bot: Client, session_string: str):
     session = await Session.find_one(Session.session_string == session_string)
     if session:
         session_username = session.username
         await session.delete()
+        remove_session(session)
         user_id = session.user.id
         with suppress(Exception):
             await bot.send_message(
@@ -20,24 +28,29 @@ async def delete_and_notify_session(bot: Client, session_string: str):
 async def stop_client_by_session(session: Session): 
 
     await session.delete()
+    remove_session(session)
 
     try:
-        app: Client = Config.CLIENTS[session.id]
+        # an idle client is connected just to end the session on Telegram's side
+        app: Client = await connect_client(session)
         await app.log_out()
     except Exception as e:
         traceback.print_exc()
-
-    Config.CLIENTS.pop(session.id, None)
+        # logging out failed, the client may still be connected
+        await stop_client(session.id)
+    else:
+        # log_out already stopped the client
+        forget_client(session.id)
     return True
 
 async def get_client_by_user_id(user_id: int):
-    session = await Session.find_one(Session.user.id == user_id)
+    session = get_session_by_user_id(user_id)
     if session:
-        return Config.CLIENTS[session.id]
+        return await connect_client(session)
     return None
 
 async def is_user_logged_in(user_id: int):
-    session = await Session.find_one(Session.user.id == user_id)
+    session = get_session_by_user_id(user_id)
     if session:
         return session
     return False
\ No newline at end of file
@@ -0,0 +1,42 @@
+import logging
+from typing import List, Optional
+from bot.config import Config
+from database import Session
+from plugins.common.utils.clients import get_session_user_id
+
+logger = logging.getLogger(__name__)
+
+
+async def load_sessions():
+    """Build the user id -> sessions index"""
+    sessions = await Session.find_all().sort(+Session.created_at).to_list()
+    Config.SESSIONS.clear()
+    for session in sessions:
+        add_session(session)
+    logger.info(f"Loaded {len(sessions)} sessions of {len(Config.SESSIONS)} users")
+
+
+def get_session_by_user_id(user_id: int) -> Optional[Session]:
+    """Get the active session of a user, the oldest one still logged in"""
+    return next(iter(Config.SESSIONS.get(user_id, {}).values()), None)
+
+
+def get_sessions_by_user_id(user_id: int) -> List[Session]:
+    """Get every session of a user, oldest first"""
+    return list(Config.SESSIONS.get(user_id, {}).values())
+
+
+def add_session(session: Session):
+    """Add or replace a session in the index"""
+    Config.SESSIONS.setdefault(get_session_user_id(session), {})[session.id] = session
+
+
+def remove_session(session: Session):
+    """Remove a session from the index, the user's next session becomes active"""
+    user_id = get_session_user_id(session)
+    sessions = Config.SESSIONS.get(user_id)
+    if sessions is None:
+        return
+    sessions.pop(session.id, None)
+    if not sessions:
+        del Config.SESSIONS[user_id]
@@ -17,7 +17,8 @@ from pyrogram.errors import (
     PasswordHashInvalid,
 )
 from database import Session, User
-from bot import User as UserClient
+from plugins.common.utils.clients import connect_client
+from plugins.account.utils.helpers import add_session
 
 class Data:
     generate_single_button = [
@@ -161,6 +162,7 @@ async def generate_session(bot: Client, msg: Message):
     )
     
     await session.save()
+    add_session(session)
 
     markup = InlineKeyboardMarkup(
         [
@@ -176,8 +178,7 @@ async def generate_session(bot: Client, msg: Message):
         reply_markup=markup,
     )
 
-    client = UserClient(string_session, name=f"user_{user_id}")
-    await client.start()
+    await connect_client(session)
 
 
 async def cancelled(msg: Message):
@@ -1,5 +1,4 @@
-from database import Session
-from plugins.account.utils.helpers import stop_client_by_session
+from plugins.account.utils.helpers import get_session_by_user_id, stop_client_by_session
 
 
 from pyrogram import Client, filters
@@ -9,7 +8,7 @@ from pyrogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMa
 @Client.on_message(filters.command("logout") & filters.private & filters.incoming)
 @Client.on_callback_query(filters.regex("^disconnect_account$"))
 async def disconnect_account(bot: Client, message: CallbackQuery):
-    session = await Session.find_one(Session.user.id == message.from_user.id)
+    session = get_session_by_user_id(message.from_user.id)
 
     if not session:
         return await bot.reply(
@@ -5,7 +5,7 @@ from pyrogram.types import (
     CallbackQuery,
     Message,
 )
-from database import Session
+from plugins.account.utils.helpers import get_session_by_user_id
 
 
 @Client.on_message(filters.command("login") & filters.private & filters.incoming)
@@ -13,7 +13,7 @@ from database import Session
 @Client.on_callback_query(filters.regex("^connected_account$"))
 async def connected_account(bot: Client, message: CallbackQuery | Message):
 
-    session = await Session.find_one(Session.user.id == message.from_user.id)
+    session = get_session_by_user_id(message.from_user.id)
 
     if session and session.session_string:
         text = "✅ **Account Connected**\n\n"
@@ -6,6 +6,7 @@ from bot.config import Config
 import asyncio
 import logging
 from database.user import User
+from plugins.common.utils.ratelimit import limited_call
 
 
 @Client.on_message(
@@ -82,11 +83,8 @@ async def broadcast_func(user: User, b_msg: types.Message):
 
 async def broadcast_messages(user_id: int, message: types.Message):
     try:
-        await message.copy(chat_id=user_id)
+        await limited_call(message._client, user_id, message.copy, chat_id=user_id)
         return True, "Success"
-    except errors.FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await broadcast_messages(user_id, message)
     except errors.InputUserDeactivated:
         logging.info(f"{user_id} - Removed from Database, since deleted account.")
         return False, "Deleted"
@@ -1,5 +1,4 @@
-import asyncio
-from .index import start_batch_index
+from .scheduler import batch_scheduler
 from database import Batch
 from pyrogram import Client
 import logging
@@ -7,9 +6,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 async def auto_resume_batch(bot: Client):
-    batches = await Batch.find(Batch.completed == False).to_list()
-    tasks = []
+    batches = await Batch.find(Batch.completed == False, Batch.active == True).to_list()
     for batch in batches:
         logger.info(f"Auto resuming batch {batch.id}")
-        tasks.append(start_batch_index(bot, batch, resend_progress_message=True))
-    await asyncio.gather(*tasks, return_exceptions=True)
\ No newline at end of file
+        await batch_scheduler.schedule(bot, batch, resend_progress_message=True)
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import Optional
+from pymongo.errors import PyMongoError
+from bot.config import Config
+from database import Batch
+
+logger = logging.getLogger(__name__)
+
+
+class BatchControl:
+    """Stop signal of a running batch, set by the pause and delete handlers"""
+
+    def __init__(self):
+        self.stopped: Optional[str] = None  # "paused", "deleted" or "lost"
+        self.event = asyncio.Event()
+
+    def signal(self, status: str):
+        # a delete wins over a pause that arrived first
+        if self.stopped != "deleted":
+            self.stopped = status
+        self.event.set()
+
+
+def register_batch_control(batch_id) -> BatchControl:
+    """Create the control of a batch that is about to run"""
+    control = BatchControl()
+    Config.BATCH_CONTROLS[str(batch_id)] = control
+    return control
+
+
+def unregister_batch_control(batch_id):
+    """Forget the control of a batch that stopped running"""
+    Config.BATCH_CONTROLS.pop(str(batch_id), None)
+
+
+def signal_batch(batch_id, status: str) -> bool:
+    """Tell a batch running in this process to stop, returns False if it isn't"""
+    control = Config.BATCH_CONTROLS.get(str(batch_id))
+    if control is None:
+        return False
+    logger.info(f"Signalling batch {batch_id}: {status}")
+    control.signal(status)
+    return True
+
+
+async def watch_batch_changes():
+    """Relay pauses and deletes made by other processes through a change stream.
+
+    Change streams need a replica set, so the watcher is opt in and gives up
+    with a warning when the deployment doesn't support them.
+    """
+    pipeline = [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}]
+    try:
+        async with Batch.get_motor_collection().watch(
+            pipeline, full_document="updateLookup"
+        ) as stream:
+            logger.info("Watching batch changes")
+            async for change in stream:
+                batch_id = change["documentKey"]["_id"]
+                if change["operationType"] == "delete":
+                    signal_batch(batch_id, "deleted")
+                elif not (change.get("fullDocument") or {}).get("active", True):
+                    signal_batch(batch_id, "paused")
+    except PyMongoError as e:
+        logger.warning(f"Batch change stream unavailable: {e}")
@@ -226,8 +226,13 @@ async def prompt_end_message(query, start_message_id, source_channel_id):
         return None
 
 
-def create_confirmation_message(forward, start_message_id, end_message_id, forward_id):
-    """Create the confirmation message and keyboard for batch indexing"""
+def create_confirmation_message(
+    forward, start_message_id, end_message_id, forward_id, multi_account=False
+):
+    """Create the confirmation message and keyboard for batch indexing.
+
+    The multi-account button is only offered to users with several accounts.
+    """
 
     def make_message_link(chat_id, message_id):
         # Handles both public and private channels
@@ -259,12 +264,18 @@ def create_confirmation_message(forward, start_message_id, end_message_id, forwa
         f"batch_index_{forward_id}_{start_message_id or 0}_{end_message_id or 0}"
     )
 
-    keyboard = InlineKeyboardMarkup(
-        [
-            [InlineKeyboardButton("✅ Start Indexing", callback_data=callback_data)],
-            [InlineKeyboardButton("❌ Cancel", callback_data="batch_list")],
-        ]
-    )
+    buttons = [[InlineKeyboardButton("✅ Start Indexing", callback_data=callback_data)]]
+    if multi_account:
+        buttons.append(
+            [
+                InlineKeyboardButton(
+                    "⚡ Start Multi-Account Indexing",
+                    callback_data=f"{callback_data}_multi",
+                )
+            ]
+        )
+    buttons.append([InlineKeyboardButton("❌ Cancel", callback_data="batch_list")])
+    keyboard = InlineKeyboardMarkup(buttons)
 
     return confirmation_text, keyboard
 
@@ -1,15 +1,36 @@
 import asyncio
-import re
 import time
-from pyrogram import Client
-from database import Batch, Forward, File, User
+from pyrogram import Client, errors
+from bot.config import Config
+from database import Batch, Forward, User
 from plugins.account.utils import get_client_by_user_id
-from typing import Dict
+from plugins.common.utils.clients import pin_user, unpin_user
+from plugins.common.utils.ratelimit import limited_call
+from plugins.common.utils.topic_names import (
+    TOPIC_PATTERN,
+    get_topic_pattern,
+    parse_topic_name,
+)
+from plugins.common.utils.topics import (
+    get_topic_id,
+    invalidate_topic,
+    is_topic_not_found,
+)
+from .control import BatchControl, register_batch_control, unregister_batch_control
+from .lease import BatchLease
+from .ledger import FileLedger, create_file_ledger
+from .shards import align_shard_ranges, get_shard_clients, split_message_range
+from typing import AsyncGenerator, Container, Dict, List, Optional, Set, Tuple
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 import logging
 
 logger = logging.getLogger(__name__)
 
+# forwardMessages accepts at most 100 ids per call
+COPY_BATCH_SIZE = 100
+# getMessages accepts at most 200 ids per call
+READ_WINDOW_SIZE = 200
+
 
 async def start_batch_index(bot: Client, batch: Batch, **kwargs):
     """Start the batch indexing process"""
@@ -18,6 +39,44 @@ async def start_batch_index(bot: Client, batch: Batch, **kwargs):
         logger.info(f"Batch {batch.id} is not active, skipping")
         return
 
+    batch_id = batch.id
+    # registered before waiting for the lease, so a pause or delete sent
+    # while this run is starting isn't lost
+    control = register_batch_control(batch_id)
+    lease = BatchLease(batch_id)
+    try:
+        if not await lease.acquire():
+            logger.info(f"Batch {batch_id} is already running elsewhere, skipping")
+            return
+
+        # the lease may have taken a while, run from the batch as it is now
+        current = await Batch.get(batch_id)
+        if control.stopped or not current or not current.active or current.completed:
+            logger.info(f"Batch {batch_id} was stopped while waiting, skipping")
+            if control.stopped == "deleted" or not current:
+                await send_batch_delete_message(bot, batch)
+            elif not current.completed:
+                await send_batch_pause_message(bot, batch)
+            return
+        batch = current
+        await batch.fetch_all_links()
+
+        heartbeat = asyncio.create_task(lease.keep_alive(control))
+        # the owner's client stays connected for the whole run
+        pin_user(batch.user.id)
+        try:
+            await run_batch_index(bot, batch, control, **kwargs)
+        finally:
+            heartbeat.cancel()
+            unpin_user(batch.user.id)
+    finally:
+        unregister_batch_control(batch_id)
+        # a no-op when the lease was never ours
+        await lease.release()
+
+
+async def run_batch_index(bot: Client, batch: Batch, control: BatchControl, **kwargs):
+    """Copy the batch range while holding its lease"""
     await batch.fetch_all_links()
     user_id = batch.user.id
 
@@ -53,98 +112,569 @@ async def start_batch_index(bot: Client, batch: Batch, **kwargs):
             "🔄 **Resuming Batch**\n\nYour batch is now active and will continue processing.",
         )
         batch.progress_message_id = progress_message.id
-        await batch.save()
+        await batch.set({Batch.progress_message_id: progress_message.id})
+
+    clients = [client]
+    if batch.sharded:
+        clients = await get_shard_clients(client, forward, user_id)
+        if len(clients) == 1:
+            logger.info(f"Batch {batch.id} has no other account to shard across")
+            await safe_execute(
+                bot.send_message,
+                user_id,
+                "ℹ️ None of your other accounts can access both chats, "
+                "so this batch runs on one account.",
+            )
 
-    topics: Dict[str, int] = await get_topics_by_forward_id(
-        client, forward.target_group_id
+    total_messages = await get_last_message_id(client, forward.source_channel_id)
+    ledger = await create_file_ledger(user, forward)
+
+    await migrate_batch_range(batch)
+    if not batch.end_message_id:
+        # pin "latest message" once so resumes don't chase new posts
+        batch.end_message_id = total_messages
+        await batch.set({Batch.end_message_id: total_messages})
+
+    end_message_id = batch.end_message_id
+    # resume right after the committed cursor
+    resume_message_id = max(start_message_id, batch.cursor_message_id + 1)
+    shards = await align_shard_ranges(
+        client,
+        forward.source_channel_id,
+        split_message_range(resume_message_id, end_message_id, len(clients)),
+    )
+    logger.info(
+        f"Batch ID: {batch.id} Cursor Message ID: {batch.cursor_message_id} Start Message ID: {start_message_id}, Total Messages: {total_messages}, End Message ID: {end_message_id}, Shards: {len(shards)}"
     )
 
-    total_messages = await get_last_message_id(client, forward.source_channel_id)
-    start_time = time.time()
-
-    limit = (
-        total_messages - start_message_id
-        if batch.last_message_id == 0
-        else batch.last_message_id - start_message_id
-    ) + 1
-    count = 0
+    reporter = ProgressReporter(bot, batch)
+    plan = BatchPlan(ledger, shards)
+    logger.info(f"Batch {batch.id} plan: at most {plan.work} messages to copy")
+
+    run = BatchRun(bot, batch, forward, ledger, plan, shards, control, reporter)
+    scan = asyncio.create_task(scan_batch(run, clients, shards))
+    ledger_stage = asyncio.create_task(ledger_worker(run))
+    try:
+        await asyncio.gather(
+            *[
+                index_shard(run, shard_client, shard_no, shard_start, shard_end)
+                for shard_no, (shard_client, (shard_start, shard_end)) in enumerate(
+                    zip(clients, shards)
+                )
+            ]
+        )
+    finally:
+        scan.cancel()
+        if not ledger_stage.done():
+            await run.ledger_queue.put(None)
+        await ledger_stage
+
+    if run.error:
+        raise run.error
+
+    if run.stopped == "lost":
+        # the runner that took the lease over owns the progress message now
+        logger.info(f"Batch {batch.id} was taken over, stopping")
+        return
+
+    if run.stopped == "deleted":
+        logger.info(f"Batch {batch.id} deleted, stopping")
+        await send_batch_delete_message(bot, batch)
+        return
+
+    if run.stopped == "paused":
+        logger.info(f"Batch {batch.id} is not active, stopping")
+        await send_batch_pause_message(bot, batch)
+        return
+
+    # Send completion message
+    logger.info(f"Sending batch completion message for batch {batch.id}")
+    await send_batch_completion_message(
+        bot, batch, forward, run.done, plan.work, run.start_time
+    )
+
+
+class BatchPlan:
+    """Work a batch still has to do.
+
+    Until the scan of the range is done it is estimated as every id that
+    isn't copied yet, shrinking as the shards read past ids that turn out
+    missing or not worth copying. Once the scan is done it is the scan's count.
+    """
+
+    def __init__(self, ledger: FileLedger, shards: List[Tuple[int, int]]):
+        # ids copied before this run, what this run copies still counts as work
+        self.copied: Set[int] = set(ledger.copied_message_ids)
+        self.work = sum(self.count_uncopied(start, end) for start, end in shards)
+        self.scanned = False
+        self.topics: Dict[str, None] = {}  # topics the scan found, created up front
+
+    def count_uncopied(self, start_message_id: int, end_message_id: int) -> int:
+        """Count the ids of a range that weren't copied before this run"""
+        size = end_message_id - start_message_id + 1
+        if size <= 0:
+            return 0
+        # walk whichever of the range and the copied ids is smaller
+        if size <= len(self.copied):
+            return sum(
+                1
+                for message_id in range(start_message_id, end_message_id + 1)
+                if message_id not in self.copied
+            )
+        return size - sum(
+            1
+            for message_id in self.copied
+            if start_message_id <= message_id <= end_message_id
+        )
+
+    def skip_range(self, start_message_id: int, end_message_id: int):
+        """Leave out a run of ids that had no message"""
+        if not self.scanned:
+            self.work -= self.count_uncopied(start_message_id, end_message_id)
+
+    def skip(self, messages: List[Message]):
+        """Leave out messages that won't be copied"""
+        if not self.scanned:
+            self.work -= sum(
+                1 for message in messages if message.id not in self.copied
+            )
+
+    def finish_scan(self, work: int):
+        """Replace the estimate with the count of the scan"""
+        self.work = work
+        self.scanned = True
+
+
+async def scan_batch(
+    run: "BatchRun", clients: List[Client], shards: List[Tuple[int, int]]
+):
+    """Count the work of a batch and create its topics, next to the copy pipeline.
+
+    The scan reads the range on its own, so copy backpressure doesn't hold it
+    back and it gets ahead of the copies. It only corrects the progress, so a
+    failed scan leaves the estimate in place.
+    """
+    try:
+        counts = await asyncio.gather(
+            *[
+                scan_shard(run, client, *shard)
+                for client, shard in zip(clients, shards)
+            ]
+        )
+    except Exception as e:
+        logger.warning(
+            f"Scan of batch {run.batch.id} failed, keeping the estimate: {e}"
+        )
+        return
+    if run.stopped:
+        return
+    run.plan.finish_scan(sum(counts))
     logger.info(
-        f"Batch ID: {batch.id} Last Message ID: {batch.last_message_id} Start Message ID: {start_message_id}, Total Messages: {total_messages}, Limit: {limit}"
+        f"Batch {run.batch.id} scan: {run.plan.work} messages to copy into {len(run.plan.topics)} topics"
     )
 
-    all_messages = []
 
-    async for message in client.search_messages(
-        chat_id=forward.source_channel_id,
-        query="",
-        offset_id=batch.last_message_id,
-        limit=limit,
-    ):
-        all_messages.append(message)
+async def scan_shard(
+    run: "BatchRun", client: Client, start_message_id: int, end_message_id: int
+) -> int:
+    """Count the messages of one shard that will be copied, creating new topics"""
+    forward, plan = run.forward, run.plan
+    work = 0
+    album: List[Message] = []
+
+    async def count(messages: List[Message], topic_name: Optional[str]):
+        nonlocal work
+        if not messages:
+            return
+        work += len(messages)
+        if topic_name not in plan.topics:
+            plan.topics[topic_name] = None
+            await safe_execute(
+                get_topic_id, client, forward.target_group_id, topic_name
+            )
 
-    all_messages.reverse()
+    async for message in iter_batch_messages(
+        client, forward.source_channel_id, start_message_id, end_message_id
+    ):
+        if run.stopped:
+            return work
 
-    for message in all_messages:
-        # Update progress every 50 messages for better user experience
-        # check every 10 message that batch is active or not
-        if count != 0 and count % 10 == 0:
-            batch = await Batch.find_one(Batch.id == batch.id)
+        if album and message.media_group_id != album[0].media_group_id:
+            await count(*get_album_work(album, forward, plan.copied))
+            album = []
 
-            if not batch:
-                logger.info(f"Batch {batch.id} not found, stopping")
-                await send_batch_delete_message(bot, batch)
-                return
-            await batch.fetch_all_links()
-            if not batch.active:
-                logger.info(f"Batch {batch.id} is not active, stopping")
-                await send_batch_pause_message(bot, batch)
-                return
+        if message.media_group_id:
+            album.append(message)
+        else:
+            topic_name = get_message_topic(message, forward, plan.copied)
+            if topic_name:
+                await count([message], topic_name)
+
+    await count(*get_album_work(album, forward, plan.copied))
+    return work
+
+
+class BatchRun:
+    """State shared by every shard and pipeline stage of a running batch"""
+
+    def __init__(
+        self,
+        bot: Client,
+        batch: Batch,
+        forward: Forward,
+        ledger: FileLedger,
+        plan: BatchPlan,
+        shards: List[Tuple[int, int]],
+        control: BatchControl,
+        reporter: "ProgressReporter",
+    ):
+        self.bot = bot
+        self.batch = batch
+        self.forward = forward
+        self.ledger = ledger
+        self.plan = plan
+        self.start_time = time.time()
+        self.count = 0  # messages read
+        self.done = 0  # messages of the plan copied or given up on
+        self.ticked_at = 0
+        # id up to which each shard has been read and routed
+        self.read_to = [shard_start - 1 for shard_start, _ in shards]
+        # first message id of each shard's copy jobs whose file entries aren't queued yet
+        self.in_flight: List[Set[int]] = [set() for _ in shards]
+        self.ledger_queue: asyncio.Queue = asyncio.Queue(
+            maxsize=Config.BATCH_STAGE_QUEUE_SIZE
+        )
+        self.control = control
+        self.reporter = reporter
+        self.error: Optional[Exception] = None  # first copy or ledger error, ends the run
+        self.saved_cursor = batch.cursor_message_id
+        # the cursor is committed right after the file entries it covers
+        ledger.on_flush = self.commit_cursor
+
+    @property
+    def stopped(self):
+        """Why the batch was stopped (paused, deleted, lost or failed), None while it runs"""
+        if self.error:
+            return "failed"
+        return self.control.stopped
+
+    @property
+    def discarding(self) -> bool:
+        """True once queued copies must be dropped instead of finished"""
+        return self.stopped in ("deleted", "lost", "failed")
+
+    @property
+    def cursor_message_id(self) -> int:
+        return min(
+            (
+                min(read_to, min(in_flight) - 1) if in_flight else read_to
+                for read_to, in_flight in zip(self.read_to, self.in_flight)
+            ),
+            default=0,
+        )
 
-        if count != 0 and count % 50 == 0:
-            logger.info(f"Updating batch progress for message {message.id}")
-            await update_batch_progress(
-                bot, batch, forward, message, count, total_messages, start_time
+    def submit(self, job: "CopyJob"):
+        self.in_flight[job.shard_no].add(job.messages[0].id)
+
+    def finish(self, job: "CopyJob"):
+        self.in_flight[job.shard_no].discard(job.messages[0].id)
+        self.done += len(job.messages)
+
+    async def tick(self):
+        """Show the progress when it is due"""
+        if self.count == 0 or self.count == self.ticked_at or self.stopped:
+            return
+        # shards share the counter, make sure only one of them handles this count
+        self.ticked_at = self.count
+
+        if self.reporter.is_due():
+            await self.reporter.report(
+                format_batch_progress(
+                    self.forward, self.done, self.plan.work, self.start_time
+                )
             )
 
-        if not valid_message_to_forward(message):
-            count += 1
-            continue
+    async def commit_cursor(self):
+        """Persist the cursor, called once the file entries behind it are written"""
+        cursor_message_id = self.cursor_message_id
+        # a runner that lost its lease must not move the new owner's cursor
+        if cursor_message_id <= self.saved_cursor or self.stopped == "lost":
+            return
+        self.saved_cursor = cursor_message_id
+        await save_batch_cursor(self.batch, cursor_message_id)
 
-        if await check_if_file_copied(
-            message.id, forward.source_channel_id, forward.target_group_id, user_id
-        ):
-            count += 1
+
+class CopyJob:
+    """Messages of one shard copied to the same topic in one call"""
+
+    def __init__(self, shard_no: int, messages: List[Message], topic_name: str):
+        self.shard_no = shard_no
+        self.messages = messages
+        self.topic_name = topic_name
+
+
+async def index_shard(
+    run: BatchRun,
+    client: Client,
+    shard_no: int,
+    start_message_id: int,
+    end_message_id: int,
+):
+    """Read and route one shard of the batch range, feeding its copy workers.
+
+    Each copy worker owns the topics hashed to it, so copies stay in order
+    inside a topic while different topics are copied concurrently.
+    """
+    queues = [
+        asyncio.Queue(maxsize=Config.BATCH_STAGE_QUEUE_SIZE)
+        for _ in range(max(Config.BATCH_COPY_WORKERS, 1))
+    ]
+    workers = [asyncio.create_task(copy_worker(run, client, queue)) for queue in queues]
+    try:
+        await read_shard(run, client, shard_no, start_message_id, end_message_id, queues)
+    except Exception as e:
+        # the other shards stop through run.stopped, raising here would leave
+        # them running after the run gave its lease up
+        logger.exception(f"Error reading shard {shard_no} of batch {run.batch.id}: {e}")
+        run.error = run.error or e
+    finally:
+        for queue in queues:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+
+async def read_shard(
+    run: BatchRun,
+    client: Client,
+    shard_no: int,
+    start_message_id: int,
+    end_message_id: int,
+    queues: List[asyncio.Queue],
+):
+    """Route the messages of a shard in order into copy jobs"""
+    forward = run.forward
+    pending = PendingCopy(run, shard_no, queues)
+    # parts of the album being read, an album is only routed once it is complete
+    album: List[Message] = []
+    # id of the last message read, the ids between two messages don't exist
+    read_message_id = start_message_id - 1
+
+    async for message in iter_batch_messages(
+        client, forward.source_channel_id, start_message_id, end_message_id
+    ):
+        await run.tick()
+        if run.stopped:
+            break
+
+        run.plan.skip_range(read_message_id + 1, message.id - 1)
+        read_message_id = message.id
+
+        if album and message.media_group_id != album[0].media_group_id:
+            await pending.add_album(album)
+            album = []
+
+        if message.media_group_id:
+            album.append(message)
+        else:
+            topic_name = get_message_topic(message, forward, run.ledger)
+            if topic_name:
+                await pending.add([message], topic_name)
+            else:
+                run.plan.skip([message])
+
+        run.count += 1
+        unsent = pending.messages or album
+        run.read_to[shard_no] = unsent[0].id - 1 if unsent else message.id
+
+    if run.discarding:
+        return
+
+    # an album cut short by a pause is read again in full on resume
+    if not run.stopped:
+        await pending.add_album(album)
+    await pending.flush()
+    if not run.stopped:
+        run.plan.skip_range(read_message_id + 1, end_message_id)
+        run.read_to[shard_no] = end_message_id
+
+
+async def copy_worker(run: BatchRun, client: Client, queue: asyncio.Queue):
+    """Copy the jobs of a queue in order and hand the copies to the ledger stage"""
+    while True:
+        job: CopyJob = await queue.get()
+        if job is None:
+            return
+        if run.discarding:
             continue
 
-        topic_name = extract_topic_name(message)
-        if not topic_name:
-            count += 1
+        try:
+            copied = await copy_pending_messages(
+                client, job.messages, run.forward, job.topic_name
+            )
+        except Exception as e:
+            # the job stays in flight so the cursor never passes it
+            logger.exception(f"Error copying to topic {job.topic_name}: {e}")
+            run.error = run.error or e
             continue
 
-        if topic_name not in topics:
-            topic_created = await create_topic(
-                client, forward.target_group_id, topic_name
+        await run.ledger_queue.put((job, copied))
+
+
+async def ledger_worker(run: BatchRun):
+    """Record the file entries of finished copies, flushing on size or time"""
+    while True:
+        try:
+            item = await asyncio.wait_for(
+                run.ledger_queue.get(), timeout=Config.LEDGER_FLUSH_INTERVAL
             )
-            logger.info(f"Created topic {topic_name} with id {topic_created.id}")
-            topics[topic_name] = topic_created.id
+        except asyncio.TimeoutError:
+            # runs of skipped messages add nothing, the cursor still moves on
+            await flush_ledger(run)
+            continue
 
-        topic_id = topics[topic_name]
+        if item is None:
+            await flush_ledger(run)
+            return
 
-        log = await copy_message_to_topic(message, forward.target_group_id, topic_id)
-        if log:
-            await create_file_entry(message, log, user, forward)
-        count += 1
-        await asyncio.sleep(1)
+        job, copied = item
+        try:
+            for message, log in copied:
+                await run.ledger.add(message, log)
+        except Exception as e:
+            fail_ledger(run, e)
+        run.finish(job)
 
-    await update_batch_progress(
-        bot, batch, forward, message, count, total_messages, start_time
-    )
 
-    # Send completion message
-    logger.info(f"Sending batch completion message for message {message.id}")
-    await send_batch_completion_message(
-        bot, batch, forward, count, total_messages, start_time
+async def flush_ledger(run: BatchRun):
+    """Write the buffered file entries and commit the cursor behind them"""
+    try:
+        await run.ledger.flush()
+    except Exception as e:
+        fail_ledger(run, e)
+
+
+def fail_ledger(run: BatchRun, e: Exception):
+    # the stage keeps draining so the copy workers never block on it, and the
+    # run stops since its file entries and cursor can't be saved
+    logger.exception(f"Error recording copies of batch {run.batch.id}: {e}")
+    run.error = run.error or e
+
+
+class PendingCopy:
+    """Consecutive messages going to the same topic, queued as one copy job"""
+
+    def __init__(self, run: BatchRun, shard_no: int, queues: List[asyncio.Queue]):
+        self.run = run
+        self.shard_no = shard_no
+        self.queues = queues
+        self.messages: List[Message] = []
+        self.topic_name = None
+
+    async def add(self, messages: List[Message], topic_name: str):
+        """Add messages, queueing the pending ones first if they can't share a call"""
+        if self.messages and (
+            topic_name != self.topic_name
+            or len(self.messages) + len(messages) > COPY_BATCH_SIZE
+        ):
+            await self.flush()
+
+        self.messages.extend(messages)
+        self.topic_name = topic_name
+
+    async def add_album(self, album: List[Message]):
+        """Add the missing parts of an album"""
+        parts, topic_name = get_album_work(album, self.run.forward, self.run.ledger)
+        if parts:
+            await self.add(parts, topic_name)
+        else:
+            self.run.plan.skip(album)
+
+    async def flush(self):
+        """Queue the pending messages to the copy worker of their topic"""
+        if not self.messages:
+            return
+        job = CopyJob(self.shard_no, self.messages, self.topic_name)
+        self.messages = []
+        self.run.submit(job)
+        queue = self.queues[hash(job.topic_name) % len(self.queues)]
+        await queue.put(job)
+
+
+def get_message_topic(
+    message: Message, forward: Forward, ledger: Container[int]
+) -> Optional[str]:
+    """The topic a message is copied to, None when it is skipped"""
+    if valid_message_to_forward(message) and message.id not in ledger:
+        return extract_topic_name(message, forward)
+
+
+def get_album_work(
+    album: List[Message], forward: Forward, ledger: Container[int]
+) -> Tuple[List[Message], Optional[str]]:
+    """The parts of an album still to copy and the topic of its caption"""
+    topic_name = extract_post_topic_name(album, forward)
+    if not topic_name:
+        return [], None
+    return [message for message in album if message.id not in ledger], topic_name
+
+
+async def iter_batch_messages(
+    client: Client, chat_id: int, start_message_id: int, end_message_id: int
+) -> AsyncGenerator[Message, None]:
+    """Stream the messages between two ids oldest first.
+
+    The range is read in windows of ids with get_messages by a reader task
+    that stays up to BATCH_READ_AHEAD windows ahead of the consumer.
+    """
+    windows = [
+        (window_start, min(window_start + READ_WINDOW_SIZE - 1, end_message_id))
+        for window_start in range(
+            max(start_message_id, 1), end_message_id + 1, READ_WINDOW_SIZE
+        )
+    ]
+    if not windows:
+        return
+
+    queue = asyncio.Queue(maxsize=max(Config.BATCH_READ_AHEAD, 1))
+    reader = asyncio.create_task(read_message_windows(client, chat_id, windows, queue))
+    try:
+        for _ in windows:
+            messages = await queue.get()
+            if isinstance(messages, Exception):
+                raise messages
+            for message in messages:
+                yield message
+    finally:
+        # the consumer stopped early, don't leave the reader running
+        reader.cancel()
+
+
+async def read_message_windows(
+    client: Client, chat_id: int, windows: List[Tuple[int, int]], queue: asyncio.Queue
+):
+    """Read windows in order into a bounded queue, passing an error on as an item"""
+    for window in windows:
+        try:
+            messages = await read_message_window(client, chat_id, *window)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(messages)
+
+
+async def read_message_window(
+    client: Client, chat_id: int, start_message_id: int, end_message_id: int
+) -> List[Message]:
+    """Read one window of ids, leaving out deleted and missing messages"""
+    messages = await limited_call(
+        client,
+        chat_id,
+        client.get_messages,
+        chat_id=chat_id,
+        message_ids=list(range(start_message_id, end_message_id + 1)),
+        replies=0,
     )
+    return [message for message in messages if not message.empty]
 
 
 async def get_progress_message(bot: Client, batch: Batch):
@@ -160,53 +690,106 @@ async def edit_progress_message(bot: Client, batch: Batch, text: str, **kwargs):
     )
 
 
-async def copy_message_to_topic(message: Message, target_group_id: int, topic_id: int):
-    """Copy a message to a topic"""
+async def copy_messages_to_topic(
+    client: Client, messages: List[Message], target_group_id: int, topic_id: int
+) -> List[Tuple[Message, Message]]:
+    """Copy messages to a topic in one call and pair each source with its copy"""
     try:
-        log = await message._client.floodwait_handler(
-            message.copy, chat_id=target_group_id, message_thread_id=topic_id
+        logs = await limited_call(
+            client,
+            target_group_id,
+            client.forward_messages,
+            chat_id=target_group_id,
+            from_chat_id=messages[0].chat.id,
+            message_ids=[message.id for message in messages],
+            message_thread_id=topic_id,
+            hide_sender_name=True,
         )
-        return log
     except Exception as e:
-        logger.error(f"Error copying message to topic: {e}")
-        return None
+        if is_topic_not_found(e):
+            raise
+        logger.error(f"Error copying messages to topic: {e}")
+        return []
+
+    logs = sorted(logs, key=lambda log: log.id)
+    if len(logs) != len(messages):
+        # some sources vanished between read and copy, pair the copies with the
+        # ones still there so a resume doesn't copy them a second time
+        messages = await get_surviving_messages(client, messages)
+        if len(logs) != len(messages):
+            logger.warning(
+                f"Copied {len(logs)} of {len(messages)} messages to topic {topic_id}, pairing them in order"
+            )
 
+    return list(zip(messages, logs))
 
-async def create_file_entry(source_message, target_message, user, forward):
-    """Create a file entry"""
 
-    file = File(
-        source_message_id=source_message.id,
-        source_channel_id=source_message.chat.id,
-        target_message_id=target_message.id,
-        target_group_id=target_message.chat.id,
-        user=user,
-        forward=forward,
-    )
-    await file.save()
+async def get_surviving_messages(
+    client: Client, messages: List[Message]
+) -> List[Message]:
+    """Re-read a run of messages and keep the ones that weren't deleted"""
+    chat_id = messages[0].chat.id
+    try:
+        current = await limited_call(
+            client,
+            chat_id,
+            client.get_messages,
+            chat_id=chat_id,
+            message_ids=[message.id for message in messages],
+            replies=0,
+        )
+    except Exception as e:
+        logger.error(f"Error re-reading messages of {chat_id}: {e}")
+        return messages
+    surviving_ids = {message.id for message in current if not message.empty}
+    return [message for message in messages if message.id in surviving_ids]
 
 
-async def create_topic(client: Client, target_group_id: int, topic_name: str):
-    """Create a topic"""
-    return await client.floodwait_handler(
-        client.create_forum_topic, chat_id=target_group_id, title=topic_name
-    )
+async def copy_pending_messages(
+    client: Client,
+    messages: List[Message],
+    forward: Forward,
+    topic_name: str,
+) -> List[Tuple[Message, Message]]:
+    """Copy a run of messages to their topic, pairing each source with its copy"""
+    if not messages:
+        return []
 
+    try:
+        topic_id = await get_topic_id(client, forward.target_group_id, topic_name)
+        copied = await copy_messages_to_topic(
+            client, messages, forward.target_group_id, topic_id
+        )
+    except Exception as e:
+        if not is_topic_not_found(e):
+            raise
+        # the topic was deleted since it was cached, look it up again once
+        logger.warning(f"Topic {topic_name} not found in {forward.target_group_id}")
+        invalidate_topic(forward.target_group_id, topic_name)
+        topic_id = await get_topic_id(client, forward.target_group_id, topic_name)
+        copied = await copy_messages_to_topic(
+            client, messages, forward.target_group_id, topic_id
+        )
+    return copied
 
-def extract_topic_name(message: Message):
-    """Extract the topic name from a message"""
-    text = message.caption or message.text
-    topic_pattern = r"Topic:\s*(.+?)(?:\n|$)"
 
-    topic_match = re.search(topic_pattern, text, re.IGNORECASE | re.MULTILINE)
+def extract_topic_name(message: Message, forward: Optional[Forward] = None):
+    """Extract the topic name from a message, with the forward's pattern and aliases"""
+    pattern = TOPIC_PATTERN
+    aliases = None
+    if forward:
+        if forward.topic_pattern:
+            pattern = get_topic_pattern(forward.topic_pattern)
+        aliases = forward.topic_aliases
+    return parse_topic_name(message.caption or message.text, pattern, aliases)
 
-    if not topic_match:
-        return
 
-    extracted_topic = topic_match.group(1).strip()
-    # replace more than one whitespace with a single whitespace
-    extracted_topic = re.sub(r"\s+", " ", extracted_topic)
-    return extracted_topic
+def extract_post_topic_name(messages: List[Message], forward: Optional[Forward] = None):
+    """Extract the topic name of a post from whichever of its messages has one"""
+    for message in messages:
+        topic_name = extract_topic_name(message, forward)
+        if topic_name:
+            return topic_name
 
 
 def valid_message_to_forward(message: Message):
@@ -214,24 +797,13 @@ def valid_message_to_forward(message: Message):
     return bool(message.caption)
 
 
-async def get_topics_by_forward_id(bot: Client, forward_id: int):
-    """Get topics by forward id"""
-    topics: Dict[str, int] = {}
-    async for topic in bot.get_forum_topics(forward_id):
-        topics[topic.title] = topic.id
-    return topics
-
-
-async def update_batch_progress(
-    bot: Client,
-    batch: Batch,
+def format_batch_progress(
     forward: Forward,
-    message: Message,
     done_till_now: int,
     total_messages: int,
     start_time: float,
-):
-    """Update the batch progress with a beautiful progress bar"""
+) -> str:
+    """Format the batch progress with a beautiful progress bar"""
     # Calculate progress metrics
     current_time = time.time()
     elapsed_time = current_time - start_time
@@ -276,39 +848,97 @@ async def update_batch_progress(
     messages_per_sec = done_till_now / elapsed_time if elapsed_time > 0 else 0
 
     # Create compact progress message
-    progress_text = (
+    return (
         f"🔄 **Processing Messages for {forward.source_channel_title}**\n\n"
         f"\n{bar} {progress_percentage:.1f}%\n"
         f"📊 {done_till_now:,}/{total_messages:,} • {messages_per_sec:.1f} msg/s\n"
         f"⏱️ {elapsed_str} • ETA: {eta_str}"
     )
 
-    # Update the progress message
-    await safe_execute(
-        bot.floodwait_handler,
-        bot.edit_message_text,
-        chat_id=batch.user.id,
-        message_id=batch.progress_message_id,
-        text=progress_text,
-        reply_markup=InlineKeyboardMarkup(
+
+class ProgressReporter:
+    """Edits the progress message of a batch at most every few seconds.
+
+    Edits never block the copy loop on a FloodWait, the reporter just stays
+    quiet until the wait is over, and edits that wouldn't change the text
+    are skipped.
+    """
+
+    def __init__(self, bot: Client, batch: Batch):
+        self.bot = bot
+        self.batch = batch
+        self.text = None
+        self.next_report_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def is_due(self) -> bool:
+        return time.monotonic() >= self.next_report_at and not self.lock.locked()
+
+    async def report(self, text: str):
+        """Show the progress text unless it is unchanged"""
+        self.next_report_at = time.monotonic() + Config.BATCH_PROGRESS_INTERVAL
+        if text == self.text:
+            return
+
+        async with self.lock:
+            try:
+                await self.bot.edit_message_text(
+                    chat_id=self.batch.user.id,
+                    message_id=self.batch.progress_message_id,
+                    text=text,
+                    reply_markup=get_progress_buttons(self.batch),
+                )
+            except errors.FloodWait as e:
+                logger.warning(f"Floodwait for {e.value} seconds on batch progress")
+                self.next_report_at = time.monotonic() + e.value
+                return
+            except errors.MessageNotModified:
+                pass
+            except Exception as e:
+                logger.error(f"Error updating progress of batch {self.batch.id}: {e}")
+            self.text = text
+
+
+def get_progress_buttons(batch: Batch) -> InlineKeyboardMarkup:
+    """Pause and delete buttons under the progress message"""
+    return InlineKeyboardMarkup(
+        [
             [
-                [
-                    InlineKeyboardButton(
-                        "⏸️ Pause Batch", callback_data=f"batch_pause_{batch.id}_noreply"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🗑️ Delete Batch", callback_data=f"batch_delete_{batch.id}"
-                    )
-                ],
-            ]
-        ),
+                InlineKeyboardButton(
+                    "⏸️ Pause Batch", callback_data=f"batch_pause_{batch.id}_noreply"
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    "🗑️ Delete Batch", callback_data=f"batch_delete_{batch.id}"
+                )
+            ],
+        ]
     )
 
-    # Update batch in database
-    batch.last_message_id = message.id
-    await batch.save()
+
+async def save_batch_cursor(batch: Batch, cursor_message_id: int):
+    """Persist the cursor, only that field so a pause isn't overwritten"""
+    batch.cursor_message_id = cursor_message_id
+    await batch.set({Batch.cursor_message_id: cursor_message_id})
+
+
+async def migrate_batch_range(batch: Batch):
+    """Give a batch from before the range end/cursor split its own fields"""
+    if batch.end_message_id is not None:
+        return
+
+    # last_message_id is where the legacy run would have resumed, 0 still means
+    # up to the latest message. Rescan from the start, the ledger skips
+    # everything already copied
+    logger.info(
+        f"Migrating range of legacy batch {batch.id} to end at {batch.last_message_id}"
+    )
+    batch.end_message_id = batch.last_message_id
+    batch.cursor_message_id = 0
+    await batch.set(
+        {Batch.end_message_id: batch.last_message_id, Batch.cursor_message_id: 0}
+    )
 
 
 async def send_batch_completion_message(
@@ -363,7 +993,7 @@ async def send_batch_completion_message(
     # Mark batch as inactive
     batch.active = False
     batch.completed = True
-    await batch.save()
+    await batch.set({Batch.active: False, Batch.completed: True})
 
 
 async def is_valid_chat(client: Client, chat_id: int):
@@ -443,21 +1073,8 @@ async def safe_execute(func, *args, **kwargs):
         return None
 
 
-async def check_if_file_copied(
-    source_message_id: int, source_channel_id: int, target_group_id: int, user_id: int
-):
-    """Check if a file is copied"""
-    file = await File.find_one(
-        File.source_message_id == source_message_id,
-        File.source_channel_id == source_channel_id,
-        File.user.id == user_id,
-        File.target_group_id == target_group_id,
-    )
-    return file is not None
-
-
 async def get_last_message_id(client: Client, chat_id: int):
     """Get the last message id of a channel"""
-    async for message in client.search_messages(chat_id, query="", limit=1):
+    async for message in client.get_chat_history(chat_id, limit=1):
         return message.id
     return 0
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import uuid
+from bot.config import Config
+from database import Batch
+from .control import BatchControl
+
+logger = logging.getLogger(__name__)
+
+
+class BatchLease:
+    """Mongo lease that lets exactly one runner, in any process, own a batch.
+
+    Every run gets its own token, so a second run in the same process can't
+    pass for the first one. The owner renews the lease while it runs and a
+    lease that wasn't renewed in time can be taken over by anyone. Expiries
+    are set and compared with the database server's clock ($$NOW), so
+    processes with different clocks or timezones agree on them.
+    """
+
+    def __init__(self, batch_id):
+        self.batch_id = batch_id
+        self.token = uuid.uuid4().hex
+
+    def expires_at(self) -> dict:
+        """Expression of the expiry of a lease taken or renewed now"""
+        return {"$add": ["$$NOW", int(Config.BATCH_LEASE_TTL * 1000)]}
+
+    async def try_acquire(self) -> bool:
+        """Take the lease if it is free, expired or already ours"""
+        result = await Batch.get_motor_collection().update_one(
+            {
+                "_id": self.batch_id,
+                "$or": [
+                    {"lease_owner": None},
+                    {"lease_owner": self.token},
+                    {"$expr": {"$lt": ["$lease_expires_at", "$$NOW"]}},
+                ],
+            },
+            [
+                {
+                    "$set": {
+                        "lease_owner": self.token,
+                        "lease_expires_at": self.expires_at(),
+                    }
+                }
+            ],
+        )
+        return result.matched_count == 1
+
+    async def acquire(self) -> bool:
+        """Take the lease, waiting once for a lease left by a runner that died"""
+        if await self.try_acquire():
+            return True
+
+        batch = await Batch.get(self.batch_id)
+        if not batch or not batch.lease_expires_at:
+            return await self.try_acquire()
+
+        # a live owner renews before this wait is over, a dead one's lease
+        # expires. The wait is a full TTL since this clock isn't the server's
+        logger.info(
+            f"Batch {self.batch_id} is leased, waiting {Config.BATCH_LEASE_TTL:.0f}s"
+        )
+        await asyncio.sleep(Config.BATCH_LEASE_TTL + 1)
+        return await self.try_acquire()
+
+    async def renew(self) -> bool:
+        """Push back the expiry, returns False if the lease was lost"""
+        result = await Batch.get_motor_collection().update_one(
+            {"_id": self.batch_id, "lease_owner": self.token},
+            [{"$set": {"lease_expires_at": self.expires_at()}}],
+        )
+        return result.matched_count == 1
+
+    async def release(self):
+        """Give the lease up if it is still ours"""
+        await Batch.get_motor_collection().update_one(
+            {"_id": self.batch_id, "lease_owner": self.token},
+            {"$set": {"lease_owner": None, "lease_expires_at": None}},
+        )
+
+    async def keep_alive(self, control: BatchControl):
+        """Renew the lease until cancelled, stopping the run if it is lost"""
+        while True:
+            await asyncio.sleep(Config.BATCH_LEASE_TTL / 3)
+            try:
+                renewed = await self.renew()
+            except Exception as e:
+                # keep running, the next heartbeat may get through before expiry
+                logger.error(f"Error renewing lease of batch {self.batch_id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost the lease of batch {self.batch_id}, stopping")
+                control.signal("lost")
+                return
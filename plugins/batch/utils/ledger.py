@@ -0,0 +1,84 @@
+import time
+import logging
+from typing import Awaitable, Callable, List, Optional, Set
+from pymongo.errors import BulkWriteError
+from pyrogram.types import Message
+from bot.config import Config
+from database import File, FileSourceMessage, Forward, User
+
+logger = logging.getLogger(__name__)
+
+
+class FileLedger:
+    """Write-behind buffer of the File records written by a running batch.
+
+    Records are flushed with unordered bulk inserts once the buffer is full or
+    old enough, and the ids of every copied source message are kept in memory
+    so already copied messages can be skipped without a query. `on_flush`
+    runs after every flush, the batch commits its cursor there.
+    """
+
+    def __init__(self, user: User, forward: Forward, copied_message_ids: Set[int]):
+        self.user = user
+        self.forward = forward
+        self.copied_message_ids = copied_message_ids
+        self.files: List[File] = []
+        self.flushed_at = time.monotonic()
+        self.on_flush: Optional[Callable[[], Awaitable[None]]] = None
+
+    def __contains__(self, source_message_id: int):
+        return source_message_id in self.copied_message_ids
+
+    async def add(self, source_message: Message, target_message: Message):
+        """Buffer the file entry of a copied message"""
+        self.files.append(
+            File(
+                source_message_id=source_message.id,
+                source_channel_id=source_message.chat.id,
+                target_message_id=target_message.id,
+                target_group_id=target_message.chat.id,
+                user=self.user,
+                forward=self.forward,
+            )
+        )
+        self.copied_message_ids.add(source_message.id)
+
+        if (
+            len(self.files) >= Config.LEDGER_FLUSH_SIZE
+            or time.monotonic() - self.flushed_at >= Config.LEDGER_FLUSH_INTERVAL
+        ):
+            await self.flush()
+
+    async def flush(self):
+        """Write every buffered file entry"""
+        files, self.files = self.files, []
+        self.flushed_at = time.monotonic()
+
+        if files:
+            try:
+                await File.insert_many(files, ordered=False)
+            except BulkWriteError as e:
+                logger.error(f"Error writing {len(files)} file entries: {e.details}")
+
+        if self.on_flush:
+            await self.on_flush()
+
+
+async def get_copied_message_ids(
+    source_channel_id: int, target_group_id: int, user_id: int
+) -> Set[int]:
+    """Load the ids of every source message already copied for this forward"""
+    files = File.find(
+        File.source_channel_id == source_channel_id,
+        File.target_group_id == target_group_id,
+        File.user.id == user_id,
+    ).project(FileSourceMessage)
+    return {file.source_message_id async for file in files}
+
+
+async def create_file_ledger(user: User, forward: Forward) -> FileLedger:
+    """Create the ledger of a batch, preloaded with the already copied messages"""
+    copied_message_ids = await get_copied_message_ids(
+        forward.source_channel_id, forward.target_group_id, user.id
+    )
+    return FileLedger(user, forward, copied_message_ids)
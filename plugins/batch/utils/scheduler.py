@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Deque, Dict, List
+from pyrogram import Client
+from bot.config import Config
+from database import Batch
+from .index import start_batch_index, safe_execute
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledBatch:
+    """A batch waiting for, or holding, a run slot"""
+
+    def __init__(self, bot: Client, batch: Batch, kwargs: dict):
+        self.bot = bot
+        self.batch = batch
+        self.kwargs = kwargs
+        # each batch runs on its owner's account, so this is also the client key
+        self.user_id = batch.user.id
+        self.position = None  # last queue position shown to the user
+        self.task = None
+        # set when the batch is resumed while its paused run is still winding down
+        self.rerun = None
+
+
+class BatchScheduler:
+    """Caps the batches running per client and in the whole process.
+
+    Extra batches wait in one queue per user and free slots are handed out
+    round robin between users, so one user's batches can't starve the others.
+    """
+
+    def __init__(self):
+        self.running: Dict[str, ScheduledBatch] = {}
+        self.running_per_user: Counter = Counter()
+        self.waiting: Dict[int, Deque[ScheduledBatch]] = {}
+        self.user_order: Deque[int] = deque()
+
+    def is_scheduled(self, batch_id) -> bool:
+        batch_id = str(batch_id)
+        return batch_id in self.running or any(
+            str(item.batch.id) == batch_id
+            for queue in self.waiting.values()
+            for item in queue
+        )
+
+    async def schedule(self, bot: Client, batch: Batch, **kwargs):
+        """Queue a batch and start it as soon as a slot is free"""
+        if not batch.active:
+            # a paused batch waits for the user to resume it
+            logger.info(f"Batch {batch.id} is not active, not scheduling it")
+            return
+
+        running = self.running.get(str(batch.id))
+        if running:
+            # resumed before its paused run finished, decided once that run ends
+            running.rerun = kwargs
+            return
+
+        if self.is_scheduled(batch.id):
+            logger.info(f"Batch {batch.id} is already scheduled")
+            return
+
+        await batch.fetch_all_links()
+        item = ScheduledBatch(bot, batch, kwargs)
+        if item.user_id not in self.waiting:
+            self.waiting[item.user_id] = deque()
+            self.user_order.append(item.user_id)
+        self.waiting[item.user_id].append(item)
+
+        await self.dispatch()
+
+    async def unschedule(self, batch_id):
+        """Drop a batch that is still waiting for a slot"""
+        batch_id = str(batch_id)
+        for user_id, queue in list(self.waiting.items()):
+            for item in list(queue):
+                if str(item.batch.id) == batch_id:
+                    queue.remove(item)
+            if not queue:
+                del self.waiting[user_id]
+                self.user_order.remove(user_id)
+        await self.dispatch()
+
+    def queue_order(self) -> List[ScheduledBatch]:
+        """The waiting batches in the order they will be started"""
+        queues = [list(self.waiting[user_id]) for user_id in self.user_order]
+        order = []
+        for depth in range(max(map(len, queues), default=0)):
+            order.extend(queue[depth] for queue in queues if depth < len(queue))
+        return order
+
+    async def dispatch(self):
+        """Start waiting batches while slots are free, then report queue positions"""
+        while len(self.running) < Config.BATCH_MAX_RUNNING:
+            item = next(
+                (
+                    item
+                    for item in self.queue_order()
+                    if self.running_per_user[item.user_id]
+                    < Config.BATCH_MAX_PER_CLIENT
+                ),
+                None,
+            )
+            if item is None:
+                break
+            self.start(item)
+
+        for position, item in enumerate(self.queue_order(), start=1):
+            if item.position != position:
+                item.position = position
+                await report_queue_position(item.bot, item.batch, position)
+
+    def start(self, item: ScheduledBatch):
+        queue = self.waiting[item.user_id]
+        queue.remove(item)
+        # the user goes to the back of the round robin
+        self.user_order.remove(item.user_id)
+        if queue:
+            self.user_order.append(item.user_id)
+        else:
+            del self.waiting[item.user_id]
+
+        self.running[str(item.batch.id)] = item
+        self.running_per_user[item.user_id] += 1
+        item.task = asyncio.create_task(self.run(item))
+
+    async def run(self, item: ScheduledBatch):
+        logger.info(f"Starting batch {item.batch.id}")
+        try:
+            await start_batch_index(item.bot, item.batch, **item.kwargs)
+        except Exception as e:
+            logger.exception(f"Error running batch {item.batch.id}: {e}")
+        finally:
+            del self.running[str(item.batch.id)]
+            self.running_per_user[item.user_id] -= 1
+            batch = None
+            if item.rerun is not None:
+                batch = await Batch.get(item.batch.id)
+            if batch and batch.active and not batch.completed:
+                await self.schedule(item.bot, batch, **item.rerun)
+            else:
+                await self.dispatch()
+
+
+async def report_queue_position(bot: Client, batch: Batch, position: int):
+    """Show a waiting batch its place in the queue"""
+    await safe_execute(
+        bot.edit_message_text,
+        chat_id=batch.user.id,
+        message_id=batch.progress_message_id,
+        text=(
+            "⏳ **Batch Queued**\n\n"
+            "Other batches are running right now, yours will start automatically.\n"
+            f"📍 Position in queue: **{position}**"
+        ),
+    )
+
+
+batch_scheduler = BatchScheduler()
@@ -0,0 +1,107 @@
+import logging
+from typing import List, Tuple
+from pyrogram import Client
+from bot.config import Config
+from database import Forward
+from plugins.account.utils.sessions import get_sessions_by_user_id
+from plugins.common.utils.clients import connect_client
+from plugins.common.utils.ratelimit import limited_call
+
+logger = logging.getLogger(__name__)
+
+# an album has at most 10 messages
+ALBUM_MAX_SIZE = 10
+
+
+async def can_access_forward(client: Client, forward: Forward) -> bool:
+    """Check if a client can read the source channel and reach the target group"""
+    try:
+        source = await client.get_chat(forward.source_channel_id)
+        await client.get_chat(forward.target_group_id)
+    except Exception:
+        return False
+    return not source.has_protected_content
+
+
+def has_shard_accounts(user_id: int) -> bool:
+    """Check if a user logged in more than one account to shard batches across"""
+    return len(get_sessions_by_user_id(user_id)) > 1
+
+
+async def get_shard_clients(
+    client: Client, forward: Forward, user_id: int
+) -> List[Client]:
+    """Get the batch owner's client plus their other accounts that can access both chats.
+
+    Only accounts the batch's user logged in themselves are borrowed. Idle
+    ones are connected here, and the batch's pin on its user keeps every one
+    of them connected until the run ends.
+    """
+    clients = [client]
+    for session in get_sessions_by_user_id(user_id):
+        if len(clients) >= Config.BATCH_MAX_SHARDS:
+            break
+        if session.id == client.me.id:
+            continue
+        try:
+            other = await connect_client(session)
+        except Exception as e:
+            logger.warning(f"Could not connect client {session.id} for sharding: {e}")
+            continue
+        if other and await can_access_forward(other, forward):
+            clients.append(other)
+    return clients
+
+
+def split_message_range(
+    start_message_id: int, end_message_id: int, shards: int
+) -> List[Tuple[int, int]]:
+    """Split an id range into at most `shards` contiguous (start, end) ranges"""
+    start_message_id = max(start_message_id, 1)
+    size = max(-(-(end_message_id - start_message_id + 1) // shards), 1)
+    return [
+        (shard_start, min(shard_start + size - 1, end_message_id))
+        for shard_start in range(start_message_id, end_message_id + 1, size)
+    ]
+
+
+async def align_shard_ranges(
+    client: Client, chat_id: int, shards: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+    """Move shard boundaries past the albums they cut, so each album is read by one shard"""
+    if not shards:
+        return shards
+    end_message_id = shards[-1][1]
+    aligned = []
+    for shard_start, shard_end in shards:
+        if aligned:
+            shard_start = aligned[-1][1] + 1
+        if shard_end < end_message_id:
+            album_end = await get_album_end(client, chat_id, shard_end)
+            shard_end = min(max(shard_end, album_end), end_message_id)
+        # a shard swallowed by the album before it has nothing left to read
+        if shard_start <= shard_end:
+            aligned.append((shard_start, shard_end))
+    return aligned
+
+
+async def get_album_end(client: Client, chat_id: int, message_id: int) -> int:
+    """Id of the last part of the album a message belongs to, the message's own id if none"""
+    messages = await limited_call(
+        client,
+        chat_id,
+        client.get_messages,
+        chat_id=chat_id,
+        message_ids=list(
+            range(max(message_id - ALBUM_MAX_SIZE + 1, 1), message_id + ALBUM_MAX_SIZE)
+        ),
+        replies=0,
+    )
+    messages = [message for message in messages if not message.empty]
+    before = [message for message in messages if message.id <= message_id]
+    if not before or not before[-1].media_group_id:
+        return message_id
+    media_group_id = before[-1].media_group_id
+    return max(
+        message.id for message in messages if message.media_group_id == media_group_id
+    )
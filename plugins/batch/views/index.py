@@ -4,16 +4,17 @@ from database.batch import Batch
 from pyrogram import Client, filters
 from pyrogram.types import CallbackQuery
 
-from plugins.batch.utils.index import start_batch_index
+from plugins.batch.utils.scheduler import batch_scheduler
 
 
-@Client.on_callback_query(filters.regex("^batch_index_(\d+)_(\d+)_(\d+)$"))
+@Client.on_callback_query(filters.regex("^batch_index_(\d+)_(\d+)_(\d+)(_multi)?$"))
 async def batch_index_channel(bot: Client, query: CallbackQuery):
     """Handle batch indexing of a channel"""
     user_id = query.from_user.id
     forward_id = int(query.data.split("_")[2])
     start_message_id = int(query.data.split("_")[3])
     end_message_id = int(query.data.split("_")[4])
+    sharded = query.data.endswith("_multi")
 
     # Get the forward details
     forward = await get_forward_by_id(forward_id, user_id)
@@ -35,12 +36,13 @@ async def batch_index_channel(bot: Client, query: CallbackQuery):
         forward=forward,
         active=True,
         progress_message_id=query.message.id,
-        last_message_id=end_message_id,
+        end_message_id=end_message_id,
         start_message_id=start_message_id,
+        sharded=sharded,
     )
 
     await batch.save()
     await query.edit_message_text(text)
 
     batch = await Batch.find_one(Batch.id == batch.id, fetch_links=True)
-    await start_batch_index(bot, batch)
\ No newline at end of file
+    await batch_scheduler.schedule(bot, batch)
\ No newline at end of file
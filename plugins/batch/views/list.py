@@ -15,6 +15,7 @@ from ..utils.helpers import (
     create_confirmation_message,
     handle_batch_search,
 )
+from ..utils.shards import has_shard_accounts
 from pyrogram.types import Chat
 from database import Batch
 
@@ -146,7 +147,11 @@ async def confirm_batch_index(bot: Client, query: CallbackQuery):
 
     # Show confirmation
     confirmation_text, keyboard = create_confirmation_message(
-        forward, start_message_id, end_message_id, forward_id
+        forward,
+        start_message_id,
+        end_message_id,
+        forward_id,
+        multi_account=has_shard_accounts(user_id),
     )
 
     await query.message.reply_text(confirmation_text, reply_markup=keyboard)
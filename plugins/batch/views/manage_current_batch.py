@@ -4,7 +4,8 @@ from pyrogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBu
 from bson import ObjectId
 
 from plugins.batch.views.list import list_batch_forwards
-from plugins.batch.utils.index import start_batch_index
+from plugins.batch.utils.control import signal_batch
+from plugins.batch.utils.scheduler import batch_scheduler
 
 
 @Client.on_callback_query(filters.regex("^batch_current$"))
@@ -102,7 +103,7 @@ async def batch_resume_handler(bot: Client, query: CallbackQuery):
 
     # Resume batch by setting active to True
     batch.active = True
-    await batch.save()
+    await batch.set({Batch.active: True})
     await query.answer("✅ Batch will be resumed soon!", show_alert=True)
     # Refresh the current batch view
 
@@ -110,7 +111,7 @@ async def batch_resume_handler(bot: Client, query: CallbackQuery):
     if not query.data.endswith("_noreply"):
         await batch_current_batch(bot, query)
 
-    await start_batch_index(bot, batch, resend_progress_message=True)
+    await batch_scheduler.schedule(bot, batch, resend_progress_message=True)
 
 
 # Pause batch handler
@@ -129,7 +130,9 @@ async def batch_pause_handler(bot: Client, query: CallbackQuery):
 
     # Pause batch by setting active to False
     batch.active = False
-    await batch.save()
+    await batch.set({Batch.active: False})
+    signal_batch(batch.id, "paused")
+    await batch_scheduler.unschedule(batch.id)
 
     await query.answer("⏸️ Batch will be paused soon!", show_alert=True)
     # Refresh the current batch view
@@ -195,6 +198,8 @@ async def batch_delete_final_handler(bot: Client, query: CallbackQuery):
 
     # Delete the batch
     await batch.delete()
+    signal_batch(batch.id, "deleted")
+    await batch_scheduler.unschedule(batch.id)
 
     await query.answer("🗑️ Batch deleted successfully!", show_alert=True)
 
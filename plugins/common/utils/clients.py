@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Set
+from beanie import Link
+from pyrogram import Client
+from bot.config import Config
+from database import Session
+
+logger = logging.getLogger(__name__)
+
+
+def get_session_user_id(session: Session) -> int:
+    """Id of the bot user who owns a session, whether its link is fetched or not"""
+    user = session.user
+    return user.ref.id if isinstance(user, Link) else user.id
+
+
+def touch_client(client: Client):
+    """Mark a user client as just used so it isn't disconnected as idle"""
+    if client.me:
+        Config.CLIENT_LAST_USED[client.me.id] = time.monotonic()
+
+
+def pin_user(user_id: int):
+    """Keep the client of a user connected until it is unpinned"""
+    Config.CLIENT_PINS[user_id] = Config.CLIENT_PINS.get(user_id, 0) + 1
+
+
+def unpin_user(user_id: int):
+    pins = Config.CLIENT_PINS.get(user_id, 0) - 1
+    if pins > 0:
+        Config.CLIENT_PINS[user_id] = pins
+    else:
+        Config.CLIENT_PINS.pop(user_id, None)
+
+
+async def connect_client(session: Session) -> Optional[Client]:
+    """Get the client of a session, connecting it if it isn't yet"""
+    client = Config.CLIENTS.get(session.id)
+    if client is None:
+        lock = Config.CLIENT_LOCKS.setdefault(session.id, asyncio.Lock())
+        async with lock:
+            client = Config.CLIENTS.get(session.id)
+            if client is None:
+                # bot imports this module, so the client class is imported late
+                from bot import User
+
+                started_at = time.monotonic()
+                client = await User(
+                    session.session_string, name=f"user_{session.id}"
+                ).start()
+                if client is None:
+                    return None
+                logger.info(
+                    f"Connected client {session.id} in {time.monotonic() - started_at:.1f}s"
+                )
+
+    Config.CLIENT_OWNERS[session.id] = get_session_user_id(session)
+    touch_client(client)
+    return client
+
+
+async def get_client_by_session_id(session_id: int) -> Optional[Client]:
+    """Get the client of a session id, connecting it if it isn't yet"""
+    client = Config.CLIENTS.get(session_id)
+    if client:
+        touch_client(client)
+        return client
+    session = await Session.get(session_id)
+    if not session:
+        return None
+    return await connect_client(session)
+
+
+def get_forward_owner_ids() -> Set[int]:
+    """Ids of the users with an active forward, their clients receive its posts"""
+    return {
+        forward.user.id
+        for forwards in Config.FORWARD_ROUTES.values()
+        for forward in forwards
+    }
+
+
+def forget_client(session_id: int) -> Optional[Client]:
+    """Drop a client from the pool without touching its connection"""
+    Config.CLIENT_LAST_USED.pop(session_id, None)
+    Config.CLIENT_OWNERS.pop(session_id, None)
+    return Config.CLIENTS.pop(session_id, None)
+
+
+async def stop_client(session_id: int):
+    """Disconnect a client and forget it"""
+    client = forget_client(session_id)
+    if client:
+        try:
+            await client.stop()
+        except Exception as e:
+            logger.error(f"Error stopping client {session_id}: {e}")
+
+
+async def evict_idle_clients():
+    """Disconnect the clients no forward, batch or recent command needs"""
+    busy_user_ids = get_forward_owner_ids() | set(Config.CLIENT_PINS)
+    now = time.monotonic()
+    for session_id in list(Config.CLIENTS):
+        if Config.CLIENT_OWNERS.get(session_id) in busy_user_ids:
+            continue
+        idle = now - Config.CLIENT_LAST_USED.get(session_id, 0)
+        if idle < Config.CLIENT_IDLE_TIMEOUT:
+            continue
+        logger.info(f"Disconnecting client {session_id}, idle for {idle:.0f}s")
+        await stop_client(session_id)
+
+
+async def run_client_pool():
+    """Disconnect idle clients every minute, for as long as the bot runs"""
+    if Config.CLIENT_IDLE_TIMEOUT <= 0:
+        return
+    while True:
+        await asyncio.sleep(60)
+        try:
+            await evict_idle_clients()
+        except Exception as e:
+            logger.error(f"Error evicting idle clients: {e}")
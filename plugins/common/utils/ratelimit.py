@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+
+from pyrogram import Client, errors
+from bot.config import Config
+from plugins.common.utils.clients import touch_client
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket that speeds up slowly while calls succeed and backs off hard on FloodWait"""
+
+    def __init__(
+        self,
+        rate: float,
+        max_rate: float,
+        min_rate: float = 0.05,
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+    ):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        # allow a burst of at most one second worth of calls
+        capacity = max(self.rate, 1.0)
+        self.tokens = min(capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a call may be sent"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        """Raise the rate a small step after a call went through"""
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_flood_wait(self, seconds: float):
+        """Cut the rate and hold every caller until the FloodWait is over"""
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def get_rate_limiter(key: tuple, rate: float, max_rate: float) -> AdaptiveRateLimiter:
+    """Get or create the shared limiter for a key, forgetting the least recently used"""
+    limiter = Config.RATE_LIMITERS.get(key)
+    if limiter is not None:
+        Config.RATE_LIMITERS.move_to_end(key)
+        return limiter
+
+    limiter = AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+    Config.RATE_LIMITERS[key] = limiter
+    while len(Config.RATE_LIMITERS) > Config.RATE_LIMITERS_SIZE:
+        Config.RATE_LIMITERS.popitem(last=False)
+    return limiter
+
+
+def get_client_limiter(client: Client) -> AdaptiveRateLimiter:
+    """Get the limiter shared by every call made through a client"""
+    return get_rate_limiter(
+        ("client", client.name),
+        rate=Config.CLIENT_RATE_LIMIT / 2,
+        max_rate=Config.CLIENT_RATE_LIMIT,
+    )
+
+
+def get_chat_limiter(chat_id: int) -> AdaptiveRateLimiter:
+    """Get the limiter shared by every call sending into a chat"""
+    return get_rate_limiter(
+        ("chat", chat_id),
+        rate=Config.CHAT_RATE_LIMIT / 2,
+        max_rate=Config.CHAT_RATE_LIMIT,
+    )
+
+
+async def limited_call(client: Client, chat_id: int, func, *args, **kwargs):
+    """Run a send call through the client and target chat limiters, retrying on FloodWait"""
+    limiters = [get_client_limiter(client), get_chat_limiter(chat_id)]
+    touch_client(client)
+    while True:
+        for limiter in limiters:
+            await limiter.acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except errors.FloodWait as e:
+            logger.warning(
+                f"Floodwait for {e.value} seconds at {func.__name__} in {chat_id}"
+            )
+            for limiter in limiters:
+                limiter.on_flood_wait(e.value)
+            continue
+
+        for limiter in limiters:
+            limiter.on_success()
+        return result
@@ -0,0 +1,45 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Pattern
+
+logger = logging.getLogger(__name__)
+
+# the default "Topic: <name>" line of a caption or text
+TOPIC_PATTERN = re.compile(r"Topic:\s*(.+?)(?:\n|$)", re.IGNORECASE | re.MULTILINE)
+
+
+@lru_cache(maxsize=256)
+def get_topic_pattern(pattern: str) -> Pattern:
+    """Compile a forward's custom topic pattern once, the default one if it is invalid"""
+    try:
+        return re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+    except re.error as e:
+        # cached, so this is logged once per pattern
+        logger.warning(f"Invalid topic pattern {pattern!r}, using the default: {e}")
+        return TOPIC_PATTERN
+
+
+def parse_topic_name(
+    text: Optional[str],
+    pattern: Pattern = TOPIC_PATTERN,
+    aliases: Optional[Dict[str, str]] = None,
+) -> Optional[str]:
+    """Find the topic name in a text, with its whitespace collapsed.
+
+    The first group of the pattern is the name, or the whole match when the
+    pattern has no group. `aliases` maps lowercase names to the topic to use.
+    """
+    if not text:
+        return None
+
+    match = pattern.search(text)
+    if not match:
+        return None
+
+    topic_name = " ".join((match.group(1) if pattern.groups else match.group()).split())
+    if not topic_name:
+        return None
+    if aliases:
+        return aliases.get(topic_name.lower(), topic_name)
+    return topic_name
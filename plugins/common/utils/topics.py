@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+from pyrogram import Client
+from pyrogram.errors import RPCError
+from bot.config import Config
+from plugins.common.utils.ratelimit import limited_call
+
+logger = logging.getLogger(__name__)
+
+TOPIC_NOT_FOUND_ERRORS = ("TOPIC_DELETED", "TOPIC_ID_INVALID")
+
+
+class TopicCache:
+    """Topic name -> thread id cache of one forum group"""
+
+    def __init__(self):
+        self.topics: Dict[str, int] = {}
+        self.loaded_at = 0.0
+        # serializes refreshes and creations so two paths never create the same topic
+        self.lock = asyncio.Lock()
+
+    def is_stale(self):
+        return time.monotonic() - self.loaded_at >= Config.TOPIC_CACHE_TTL
+
+
+def get_topic_cache(group_id: int) -> TopicCache:
+    """Get or create the topic cache of a group"""
+    cache = Config.TOPIC_CACHES.get(group_id)
+    if cache is None:
+        cache = TopicCache()
+        Config.TOPIC_CACHES[group_id] = cache
+    return cache
+
+
+async def get_topics_by_group_id(client: Client, group_id: int) -> Dict[str, int]:
+    """List every forum topic of a group"""
+    topics: Dict[str, int] = {}
+    async for topic in client.get_forum_topics(group_id):
+        topics[topic.title] = topic.id
+    return topics
+
+
+async def create_topic(client: Client, group_id: int, topic_name: str):
+    """Create a topic"""
+    return await limited_call(
+        client,
+        group_id,
+        client.create_forum_topic,
+        chat_id=group_id,
+        title=topic_name,
+    )
+
+
+async def get_topic_id(client: Client, group_id: int, topic_name: str) -> int:
+    """Get the thread id of a topic, creating the topic when it doesn't exist"""
+    cache = get_topic_cache(group_id)
+    if topic_name in cache.topics and not cache.is_stale():
+        return cache.topics[topic_name]
+
+    async with cache.lock:
+        # another path may have refreshed or created it while we waited
+        if topic_name not in cache.topics or cache.is_stale():
+            cache.topics = await get_topics_by_group_id(client, group_id)
+            cache.loaded_at = time.monotonic()
+
+        if topic_name not in cache.topics:
+            topic = await create_topic(client, group_id, topic_name)
+            logger.info(f"Created topic {topic_name} with id {topic.id} in {group_id}")
+            cache.topics[topic_name] = topic.id
+
+        return cache.topics[topic_name]
+
+
+def invalidate_topic(group_id: int, topic_name: str):
+    """Forget a topic so the next lookup refreshes the group's topics"""
+    get_topic_cache(group_id).topics.pop(topic_name, None)
+
+
+def is_topic_not_found(error: Exception) -> bool:
+    """Check if an error means the target topic no longer exists"""
+    return isinstance(error, RPCError) and error.ID in TOPIC_NOT_FOUND_ERRORS
@@ -1,19 +1,97 @@
 import asyncio
 import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import List
+from beanie.operators import In
+from pyrogram.types import Message
 from bot.config import Config
+from database import ForwardQueueItem
+from plugins.common.utils.clients import get_client_by_session_id
+from plugins.forwards.utils.queue import get_forward_queues, retry_forward_items
 from plugins.user.on_message import handle_single_forward
 
 logger = logging.getLogger(__name__)
 
+# get_messages accepts at most 200 ids per call
+FETCH_BATCH_SIZE = 200
+
 
 async def handle_forward_queue():
-    logger.info(f"Handling forward queue: {Config.FORWARD_CREATE_QUEUE}")
+    queues = get_forward_queues()
+    logger.info(f"Starting {len(queues)} forward workers")
+    await asyncio.gather(*[forward_worker(queue) for queue in queues])
+
+
+async def forward_worker(queue: asyncio.Queue):
+    """Forward queued posts, waking up as soon as one arrives"""
     while True:
-        if Config.FORWARD_CREATE_QUEUE:
-            message = Config.FORWARD_CREATE_QUEUE.pop(0)
-            await handle_single_forward(message)
-            logger.info(f"Processed message from queue: {message.chat.id}")
-        await asyncio.sleep(1)
+        items = [await queue.get()]
+        # take whatever else is already waiting so it is fetched in bulk
+        while not queue.empty() and len(items) < FETCH_BATCH_SIZE:
+            items.append(queue.get_nowait())
+
+        try:
+            await process_forward_items(items)
+        except Exception as e:
+            logger.error(f"Error processing {len(items)} queued forwards: {e}")
+        finally:
+            for _ in items:
+                queue.task_done()
+
+
+async def process_forward_items(items: List[ForwardQueueItem]):
+    """Fetch queued posts in bulk by id, forward them in order and dequeue them"""
+    for (client_id, chat_id), group in groupby(
+        items, key=lambda item: (item.client_id, item.chat_id)
+    ):
+        group = list(group)
+        await wait_for_albums(group)
+        try:
+            messages = await fetch_forward_items(client_id, chat_id, group)
+        except Exception as e:
+            # nothing of this group was forwarded yet, so it can simply run again
+            logger.error(
+                f"Error fetching {len(group)} queued posts of {chat_id}, retrying in {Config.FORWARD_RETRY_DELAY:.0f}s: {e}"
+            )
+            await retry_forward_items(group)
+            continue
+
+        for message in messages:
+            await suppress_exception(handle_single_forward, message)
+            logger.info(f"Processed message from queue: {chat_id}")
+
+        await ForwardQueueItem.find(
+            In(ForwardQueueItem.id, [item.id for item in group])
+        ).delete()
+
+
+async def fetch_forward_items(
+    client_id: int, chat_id: int, items: List[ForwardQueueItem]
+) -> List[Message]:
+    """Fetch the queued posts of a channel through the client that received them"""
+    client = await get_client_by_session_id(client_id)
+    if not client:
+        logger.warning(f"No client {client_id} to fetch posts of {chat_id}")
+        return []
+    messages = await client.get_messages(chat_id, [item.message_id for item in items])
+    return sorted(
+        (message for message in messages if not message.empty),
+        key=lambda message: message.id,
+    )
+
+
+async def wait_for_albums(items: List[ForwardQueueItem]):
+    """Give the other parts of freshly posted albums time to arrive"""
+    posted_at = max(
+        (item.created_at for item in items if item.media_group_id), default=None
+    )
+    if posted_at is None:
+        return
+    settled_at = posted_at + timedelta(seconds=Config.ALBUM_SETTLE_DELAY)
+    delay = (settled_at - datetime.now()).total_seconds()
+    if delay > 0:
+        await asyncio.sleep(delay)
 
 
 async def suppress_exception(func, *args, **kwargs):
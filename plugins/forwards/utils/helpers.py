@@ -3,6 +3,7 @@ from database.forwards import Forward
 from database.user import User
 import random
 from plugins.common.utils.search import search_user_forwards
+from .routing import add_forward_route, remove_forward_route
 
 
 async def get_user_forwards(user_id: int):
@@ -58,6 +59,7 @@ async def create_forward(
         active=True,
     )
     await forward.save()
+    add_forward_route(forward)
     return forward_id
 
 
@@ -70,6 +72,7 @@ async def delete_forward(forward_id: int, user_id: int):
     if forward:
         forward.active = False
         await forward.save()
+        remove_forward_route(forward.id)
         return True
     return False
 
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import List
+from beanie.operators import In, Inc
+from pyrogram import Client
+from pyrogram.types import Message
+from bot.config import Config
+from database import ForwardQueueItem
+
+logger = logging.getLogger(__name__)
+
+
+def get_forward_queues() -> List[asyncio.Queue]:
+    """Get the worker queues of the live forward pool"""
+    if not Config.FORWARD_QUEUES:
+        Config.FORWARD_QUEUES = [
+            asyncio.Queue() for _ in range(max(Config.FORWARD_WORKERS, 1))
+        ]
+    return Config.FORWARD_QUEUES
+
+
+def get_forward_queue(source_channel_id: int) -> asyncio.Queue:
+    """Get the queue of a source channel.
+
+    Every post of a channel goes to the same worker, so posts keep their order
+    inside each target topic while different channels run in parallel.
+    """
+    queues = get_forward_queues()
+    return queues[hash(source_channel_id) % len(queues)]
+
+
+def is_duplicate_post(chat_id: int, message_id: int) -> bool:
+    """Check if another user client already received this post, remembering it if not"""
+    return is_seen((chat_id, message_id))
+
+
+def is_duplicate_album(chat_id: int, media_group_id: str) -> bool:
+    """Check if any part of this album was already received, remembering it if not"""
+    return is_seen((chat_id, f"album_{media_group_id}"))
+
+
+def is_seen(key: tuple) -> bool:
+    now = time.monotonic()
+    seen = Config.SEEN_POSTS
+    # entries are in arrival order, so expired ones are always at the front
+    while seen and (
+        len(seen) >= Config.SEEN_POSTS_SIZE
+        or now - next(iter(seen.values())) > Config.SEEN_POSTS_TTL
+    ):
+        seen.popitem(last=False)
+
+    if key in seen:
+        return True
+    seen[key] = now
+    return False
+
+
+async def enqueue_forward(client: Client, message: Message):
+    """Persist a channel post for live forwarding and hand it to its worker"""
+    item = ForwardQueueItem(
+        chat_id=message.chat.id,
+        message_id=message.id,
+        client_id=client.me.id,
+        media_group_id=message.media_group_id,
+    )
+    await item.insert()
+    get_forward_queue(item.chat_id).put_nowait(item)
+
+
+async def retry_forward_items(items: List[ForwardQueueItem]):
+    """Hand queued posts back to their worker once the retry delay is over.
+
+    Posts whose fetch failed FORWARD_MAX_ATTEMPTS times are dropped, e.g. when
+    their client was removed from the channel.
+    """
+    for item in items:
+        item.attempts += 1
+    expired = [item for item in items if item.attempts >= Config.FORWARD_MAX_ATTEMPTS]
+    items = [item for item in items if item.attempts < Config.FORWARD_MAX_ATTEMPTS]
+
+    if expired:
+        logger.error(
+            f"Dropping {len(expired)} queued posts of {expired[0].chat_id} after {Config.FORWARD_MAX_ATTEMPTS} failed fetches"
+        )
+        await ForwardQueueItem.find(
+            In(ForwardQueueItem.id, [item.id for item in expired])
+        ).delete()
+    if items:
+        await ForwardQueueItem.find(
+            In(ForwardQueueItem.id, [item.id for item in items])
+        ).update(Inc({ForwardQueueItem.attempts: 1}))
+
+    loop = asyncio.get_running_loop()
+    for item in items:
+        loop.call_later(
+            Config.FORWARD_RETRY_DELAY,
+            get_forward_queue(item.chat_id).put_nowait,
+            item,
+        )
+
+
+async def replay_forward_queue():
+    """Queue again the posts that were not forwarded before the last shutdown"""
+    items = (
+        await ForwardQueueItem.find_all().sort(+ForwardQueueItem.created_at).to_list()
+    )
+    for item in items:
+        get_forward_queue(item.chat_id).put_nowait(item)
+    if items:
+        logger.info(f"Replaying {len(items)} queued forwards")
@@ -0,0 +1,40 @@
+import logging
+from typing import List
+from bot.config import Config
+from database.forwards import Forward
+
+logger = logging.getLogger(__name__)
+
+
+async def load_forward_routes():
+    """Build the source channel -> active forwards routing table"""
+    forwards = await Forward.find(Forward.active == True, fetch_links=True).to_list()
+    Config.FORWARD_ROUTES.clear()
+    for forward in forwards:
+        add_forward_route(forward)
+    logger.info(
+        f"Loaded {len(forwards)} forwards for {len(Config.FORWARD_ROUTES)} channels"
+    )
+
+
+def get_forward_routes(source_channel_id: int) -> List[Forward]:
+    """Get the active forwards of a source channel"""
+    return Config.FORWARD_ROUTES.get(source_channel_id, [])
+
+
+def add_forward_route(forward: Forward):
+    """Add or replace a forward in the routing table"""
+    remove_forward_route(forward.id)
+    Config.FORWARD_ROUTES.setdefault(forward.source_channel_id, []).append(forward)
+
+
+def remove_forward_route(forward_id: int):
+    """Remove a forward from the routing table"""
+    for source_channel_id, forwards in list(Config.FORWARD_ROUTES.items()):
+        remaining = [forward for forward in forwards if forward.id != forward_id]
+        if len(remaining) == len(forwards):
+            continue
+        if remaining:
+            Config.FORWARD_ROUTES[source_channel_id] = remaining
+        else:
+            del Config.FORWARD_ROUTES[source_channel_id]
@@ -1,82 +1,78 @@
 import logging
+from typing import List
 from pyrogram import Client, filters, errors
-from bot.config import Config
-from database import Forward
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import RPCError
-from plugins.batch.utils.index import (
-    extract_topic_name,
-    get_topics_by_forward_id,
-    create_topic,
+from plugins.account.utils import get_client_by_user_id
+from plugins.batch.utils.index import extract_post_topic_name
+from plugins.common.utils.ratelimit import limited_call
+from plugins.common.utils.topics import (
+    get_topic_id,
+    invalidate_topic,
+    is_topic_not_found,
 )
-import re
+from plugins.forwards.utils.queue import (
+    enqueue_forward,
+    is_duplicate_album,
+    is_duplicate_post,
+)
+from plugins.forwards.utils.routing import get_forward_routes
 
 logger = logging.getLogger(__name__)
 
 
 @Client.on_message(filters.channel)
 async def handle_on_message(bot: Client, message: Message):
-    Config.FORWARD_CREATE_QUEUE.append(message)
+    if not get_forward_routes(message.chat.id):
+        return  # No forwards configured for this channel
+    if message.media_group_id:
+        if is_duplicate_album(message.chat.id, message.media_group_id):
+            return  # The album is copied as a whole from its first part
+    elif is_duplicate_post(message.chat.id, message.id):
+        return  # Already queued by another user client in this channel
+    await enqueue_forward(bot, message)
     logger.info(f"Added message to forward queue: {message.chat.id}")
     return
 
 async def handle_single_forward(message: Message):
-    bot = message._client
     try:
         # Get any forward with source_channel_id = message.chat.id
-        forwards = await Forward.find(
-            Forward.source_channel_id == message.chat.id,
-            Forward.active == True,
-            fetch_links=True,
-        ).to_list()
+        forwards = get_forward_routes(message.chat.id)
 
         if not forwards:
             logger.info(f"No forwards configured for channel {message.chat.id}")
             return  # No forwards configured for this channel
 
-        # Extract topic name using utility function
-        extracted_topic = extract_topic_name(message)
-        if not extracted_topic:
-            logger.warning(f"No topic found in message from {message.chat.id}")
-            return
-        
-        # replace more than one whitespace with a single whitespace
-        extracted_topic = re.sub(r"\s+", " ", extracted_topic)
+        messages = [message]
+        if message.media_group_id:
+            # an album is copied whole and routed by whichever part has the caption
+            messages = await message.get_media_group()
 
         # Process each forward
         for forward in forwards:
             user_id = forward.user.id
+            # every forward may have its own topic pattern and aliases
+            extracted_topic = extract_post_topic_name(messages, forward)
+            if not extracted_topic:
+                logger.warning(
+                    f"No topic found in message from {message.chat.id} for forward {forward.id}"
+                )
+                continue
             try:
-                # Get all forum topics using utility function
-                topics = await get_topics_by_forward_id(bot, forward.target_group_id)
-
-                # Check if topic exists
-                if extracted_topic in topics:
-                    topic_id = topics[extracted_topic]
-                    # Forward message to the existing topic
-                    await message.copy(
-                        chat_id=forward.target_group_id,
-                        message_thread_id=topic_id,
-                    )
-                    logger.info(
-                        f"Forwarded message to existing topic '{extracted_topic}' in group {forward.target_group_id}"
-                    )
-                else:
-                    # Create new topic using utility function
-                    topic_created = await create_topic(
-                        bot, forward.target_group_id, extracted_topic
-                    )
-                    logger.info(
-                        f"Created topic '{topic_created.title}' in group {forward.target_group_id}"
-                    )
-                    await message.copy(
-                        chat_id=forward.target_group_id,
-                        message_thread_id=topic_created.id,
+                # every forward is copied by the account of the user who owns it
+                bot = await get_client_by_user_id(user_id)
+                if not bot:
+                    logger.warning(
+                        f"No client for user {user_id}, skipping forward {forward.id}"
                     )
-                    logger.info(
-                        f"Forwarded message to new topic '{topic_created.title}' in group {forward.target_group_id}"
-                    )
-            except errors.ChannelForumMissing:
+                    continue
+                await copy_post_to_topic(
+                    bot, messages, forward.target_group_id, extracted_topic
+                )
+                logger.info(
+                    f"Forwarded message to topic '{extracted_topic}' in group {forward.target_group_id}"
+                )
+            except errors.ChannelForumMissing as e:
                 # Send a message to the user that the forum is missing, including group id, forward id, and topic name
                 await suppress_exception(
                     bot.send_message,
@@ -114,6 +110,38 @@ async def handle_single_forward(message: Message):
         return
 
 
+async def copy_post_to_topic(
+    bot: Client, messages: List[Message], target_group_id: int, topic_name: str
+):
+    """Copy a post, one message or a whole album, to a topic, looking the topic
+    up again if it was deleted"""
+    topic_id = await get_topic_id(bot, target_group_id, topic_name)
+    try:
+        return await forward_without_author(bot, messages, target_group_id, topic_id)
+    except RPCError as e:
+        if not is_topic_not_found(e):
+            raise
+        invalidate_topic(target_group_id, topic_name)
+        topic_id = await get_topic_id(bot, target_group_id, topic_name)
+        return await forward_without_author(bot, messages, target_group_id, topic_id)
+
+
+async def forward_without_author(
+    bot: Client, messages: List[Message], target_group_id: int, topic_id: int
+):
+    """Copy messages in one call through any client that can read their channel"""
+    return await limited_call(
+        bot,
+        target_group_id,
+        bot.forward_messages,
+        chat_id=target_group_id,
+        from_chat_id=messages[0].chat.id,
+        message_ids=[message.id for message in messages],
+        message_thread_id=topic_id,
+        hide_sender_name=True,
+    )
+
+
 async def suppress_exception(func, *args, **kwargs):
     try:
         return await func(*args, **kwargs)